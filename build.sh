@@ -12,6 +12,12 @@ python manage.py collectstatic --no-input --clear
 # 3. Migraciones
 python manage.py migrate
 
+# 3.1 Metadatos (páginas, tamaño, hash) de los adjuntos que todavía no los tienen
+python manage.py analizar_adjuntos
+
+# 3.2 Pre-renderizar el CV para que el primer visitante no pague el render en frío
+python manage.py calentar_cv
+
 # 4. SUPERUSUARIO (Version INFALIBLE - Solo texto simple)
 # Este script se ejecuta directo en la shell. Si falla, lo veremos en el log.
 echo "
@@ -1,4 +1,6 @@
 from django.contrib import admin
+from django.urls import NoReverseMatch, reverse
+from django.utils import timezone
 from django.utils.html import format_html
 from .models import (
     DatosPersonales, 
@@ -8,7 +10,8 @@ from .models import (
     ProductoAcademico, 
     Reconocimiento, 
     ProductoLaboral, 
-    VentaGarage
+    VentaGarage,
+    FalloAdjunto
 )
 
 # Configuración del encabezado del panel (Opcional, pero se ve pro)
@@ -50,6 +53,7 @@ class ExperienciaLaboralAdmin(admin.ModelAdmin):
     search_fields = ('cargo', 'empresa', 'descripcion') # Barra de búsqueda
     list_editable = ('visible',) # Switch rápido
     ordering = ('-fecha_inicio',)
+    readonly_fields = ('resumen_adjunto',)
     # ORGANIZACIÓN VISUAL (Fieldsets)
     fieldsets = (
         ('Información del Cargo', {
@@ -59,7 +63,7 @@ class ExperienciaLaboralAdmin(admin.ModelAdmin):
             'fields': ('nombre_contacto', 'telefono_contacto', 'email_empresa', 'sitio_web_empresa')
         }),
         ('Archivos', {
-            'fields': ('certificado', 'visible')
+            'fields': ('certificado', 'resumen_adjunto', 'visible')
         }),
     )
 
@@ -69,6 +73,7 @@ class EstudioRealizadoAdmin(admin.ModelAdmin):
     list_filter = ('visible', 'institucion')
     search_fields = ('titulo', 'institucion')
     list_editable = ('visible',)
+    readonly_fields = ('resumen_adjunto',)
     # Organización Visual
     fieldsets = (
         ('Información Académica', {
@@ -78,7 +83,7 @@ class EstudioRealizadoAdmin(admin.ModelAdmin):
             'fields': ('descripcion',)  # <--- Aquí aparece el nuevo campo
         }),
         ('Documentación', {
-            'fields': ('archivo', 'visible')
+            'fields': ('archivo', 'resumen_adjunto', 'visible')
         }),
     )
 
@@ -88,6 +93,7 @@ class CursoCapacitacionAdmin(admin.ModelAdmin):
     search_fields = ('nombre_curso', 'institucion')
     list_filter = ('fecha_fin', 'visible',)
     list_editable = ('visible',)
+    readonly_fields = ('resumen_adjunto',)
     # ORGANIZACIÓN VISUAL (Fieldsets)
     fieldsets = (
         ('Información Académica', {
@@ -97,7 +103,7 @@ class CursoCapacitacionAdmin(admin.ModelAdmin):
             'fields': ('nombre_contacto', 'telefono_contacto', 'email_empresa')
         }),
         ('Archivos', {
-            'fields': ('certificado_pdf', 'visible')
+            'fields': ('certificado_pdf', 'resumen_adjunto', 'visible')
         }),
     )
 
@@ -106,6 +112,7 @@ class ReconocimientoAdmin(admin.ModelAdmin):
     list_display = ('nombre', 'institucion', 'fecha', 'visible')
     search_fields = ('nombre', 'institucion')
     list_editable = ('visible',)
+    readonly_fields = ('resumen_adjunto',)
     # ORGANIZACIÓN VISUAL (Fieldsets)
     fieldsets = (
         ('Detalle del Reconocimiento', {
@@ -115,7 +122,7 @@ class ReconocimientoAdmin(admin.ModelAdmin):
             'fields': ('nombre_contacto', 'telefono_contacto')
         }),
         ('Archivos', {
-            'fields': ('certificado_pdf', 'visible')
+            'fields': ('certificado_pdf', 'resumen_adjunto', 'visible')
         }),
     )
     
@@ -172,4 +179,40 @@ class ProductoAcademicoAdmin(admin.ModelAdmin):
         ('Visibilidad', {
             'fields': ('visible',)
         }),
-    )
\ No newline at end of file
+    )
+
+
+@admin.register(FalloAdjunto)
+class FalloAdjuntoAdmin(admin.ModelAdmin):
+    # Solo lectura: lo llena el generador del CV. Para arreglarlo hay que volver a subir el
+    # certificado en el registro dueño (al guardarlo, su fallo se borra solo).
+    list_display = ('nombre', 'registro', 'fallos', 'estado', 'bloqueado_hasta', 'ultimo_fallo')
+    search_fields = ('nombre', 'ultimo_error')
+    readonly_fields = ('nombre', 'url', 'registro', 'fallos', 'ultimo_error', 'primer_fallo', 'ultimo_fallo', 'bloqueado_hasta')
+    fields = readonly_fields
+    actions = ('reintentar',)
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.display(description="Estado")
+    def estado(self, obj):
+        if obj.bloqueado_hasta and obj.bloqueado_hasta > timezone.now():
+            return format_html('<span style="color:#ba2121; font-weight:bold;">Bloqueado</span>')
+        return "Se reintentará"
+
+    @admin.display(description="Registro")
+    def registro(self, obj):
+        # Enlace al registro (Experiencia, Curso, Reconocimiento) cuyo certificado falla
+        if not obj.modelo or obj.objeto_id is None:
+            return "-"
+        app, modelo = obj.modelo.lower().split('.')
+        try:
+            url = reverse(f'admin:{app}_{modelo}_change', args=[obj.objeto_id])
+        except NoReverseMatch:
+            return f"{obj.modelo} #{obj.objeto_id}"
+        return format_html('<a href="{}">{} #{}</a>', url, obj.modelo.split('.')[-1], obj.objeto_id)
+
+    @admin.action(description="Reintentar en el próximo CV (cerrar el circuito)")
+    def reintentar(self, request, queryset):
+        queryset.delete()
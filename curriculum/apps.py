@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class CurriculumConfig(AppConfig):
     name = 'curriculum'
+
+    def ready(self):
+        from . import signals
+        signals.conectar()
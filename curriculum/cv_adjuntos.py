@@ -0,0 +1,451 @@
+# curriculum/cv_adjuntos.py
+import contextvars
+import hashlib
+import logging
+import mmap
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from django.conf import settings
+from PIL import Image
+from pypdf import PdfReader
+from requests.adapters import HTTPAdapter
+
+from . import cv_admision, cv_circuito, cv_metricas, cv_optimizar
+from .cv_cache import escritura_atomica, podar
+
+logger = logging.getLogger(__name__)
+
+# Campo de archivo que se anexa al CV en cada modelo
+CAMPOS_ADJUNTOS = {
+    'ExperienciaLaboral': 'certificado',
+    'CursoCapacitacion': 'certificado_pdf',
+    'Reconocimiento': 'certificado_pdf',
+}
+# Modelos con metadatos del archivo (MetadatosAdjunto): los certificados y la evidencia de los estudios
+CAMPOS_METADATOS = {**CAMPOS_ADJUNTOS, 'EstudioRealizado': 'archivo'}
+METADATOS_VACIOS = {'adjunto_paginas': None, 'adjunto_bytes': None, 'adjunto_sha256': '', 'adjunto_valido': None,
+                    'adjunto_optimizado': '', 'adjunto_optimizado_bytes': None}
+
+BLOQUE = 64 * 1024
+TIMEOUT = 15
+
+
+class AdjuntoExcedido(Exception):
+    # El certificado supera el presupuesto: no se anexa y el índice lo indica
+    pass
+
+
+# Una sola sesión por proceso: reutiliza conexiones keep-alive entre certificados y entre CVs
+_session = None
+
+def get_session():
+    global _session
+    if _session is None:
+        s = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=settings.CV_ADJUNTOS_WORKERS)
+        s.mount('http://', adapter)
+        s.mount('https://', adapter)
+        _session = s
+    return _session
+
+
+# ==========================================
+# LECTURA DE UN ADJUNTO
+# ==========================================
+def ruta_local(archivo):
+    # Ruta en disco si el storage es local y el archivo vive dentro de MEDIA_ROOT; si no, None.
+    # Los storages remotos (Cloudinary) lanzan NotImplementedError en .path()
+    try:
+        path = os.path.realpath(archivo.storage.path(archivo.name))
+    except (NotImplementedError, AttributeError, ValueError):
+        return None
+    media_root = os.path.realpath(settings.MEDIA_ROOT)
+    if os.path.commonpath([path, media_root]) != media_root or not os.path.isfile(path):
+        return None
+    return path
+
+def _plazo_adjuntos():
+    # Segundos para leer adjuntos: lo que queda del plazo de la petición menos lo que se
+    # reserva para renderizar y escribir el PDF (None = sin plazo)
+    return cv_admision.restante(settings.CV_PLAZO_RESERVA)
+
+def descargar(url, destino):
+    # Copia la respuesta por bloques en 'destino' (archivo abierto): el PDF nunca está entero en memoria
+    cv_admision.comprobar(settings.CV_PLAZO_RESERVA)
+    restante = _plazo_adjuntos()
+    timeout = TIMEOUT if restante is None else min(TIMEOUT, restante)
+    with get_session().get(url, timeout=timeout, stream=True) as res:
+        if res.status_code != 200:
+            raise ValueError(f"HTTP {res.status_code} en {url}")
+        # Si el servidor anuncia el tamaño, ni siquiera empezamos a bajar algo que no va a entrar
+        if int(res.headers.get('Content-Length') or 0) > settings.CV_ADJUNTO_MAX_BYTES:
+            raise AdjuntoExcedido(f"más de {_mb(settings.CV_ADJUNTO_MAX_BYTES)}")
+        return copiar_limitado(res.iter_content(BLOQUE), destino)
+
+def copiar_limitado(bloques, destino):
+    total = 0
+    for bloque in bloques:
+        # Entre bloque y bloque: si se acabó el plazo se abandona (el temporal se borra)
+        cv_admision.comprobar(settings.CV_PLAZO_RESERVA)
+        total += len(bloque)
+        if total > settings.CV_ADJUNTO_MAX_BYTES:
+            raise AdjuntoExcedido(f"más de {_mb(settings.CV_ADJUNTO_MAX_BYTES)}")
+        destino.write(bloque)
+    return total
+
+def _mb(n):
+    return f"{n / (1024 * 1024):.1f}".rstrip('0').rstrip('.') + " MB"
+
+# ==========================================
+# METADATOS (al subir el archivo)
+# ==========================================
+def analizar(f, nombre):
+    # Páginas, tamaño, hash y validez de un archivo abierto (se lee por bloques y se rebobina).
+    # Solo se marca inválido si el contenido no se puede interpretar; los errores de lectura suben.
+    f.seek(0)
+    h, size = hashlib.sha256(), 0
+    for bloque in iter(lambda: f.read(BLOQUE), b''):
+        h.update(bloque)
+        size += len(bloque)
+    f.seek(0)
+    try:
+        if nombre.lower().endswith('.pdf'):
+            paginas = len(PdfReader(f).pages)
+        else:
+            # Imágenes (evidencia de EstudioRealizado): verify() revisa el archivo sin decodificarlo
+            with Image.open(f) as imagen:
+                imagen.verify()
+            paginas = 1
+        valido = paginas > 0
+    except Exception as e:
+        logger.info("Archivo adjunto ilegible %s: %s", nombre, e)
+        paginas, valido = None, False
+    f.seek(0)
+    return {'adjunto_paginas': paginas, 'adjunto_bytes': size, 'adjunto_sha256': h.hexdigest(), 'adjunto_valido': valido}
+
+def para_anexo(archivo):
+    # El anexo usa la versión optimizada del PDF (cv_optimizar) si existe; si no, el original
+    optimizado = getattr(archivo.instance, 'adjunto_optimizado', None)
+    return optimizado if optimizado else archivo
+
+def _clave(archivo):
+    # Mismo contenido (hash calculado al subirlo) = mismo certificado, aunque tenga otro nombre
+    return getattr(getattr(archivo, 'instance', None), 'adjunto_sha256', '') or archivo.name
+
+
+# ==========================================
+# CACHÉ EN DISCO DE ADJUNTOS REMOTOS (LRU)
+# ==========================================
+# Un certificado solo cambia cuando el admin lo vuelve a subir; mientras tanto se guarda
+# una copia local indexada por su nombre en el storage MÁS el hash de su contenido (calculado
+# al subirlo): si alguien lo sobrescribe con el mismo nombre (mismo public_id en Cloudinary)
+# la copia vieja ya no coincide. Los archivos todavía sin analizar van solo por nombre.
+# signals.py borra las copias de los archivos reemplazados; lo demás lo desaloja el LRU.
+def _dir_adjuntos():
+    path = os.path.join(settings.CV_CACHE_DIR, 'adjuntos')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def _ruta_cache(nombre, huella=''):
+    clave = f'{nombre}|{huella}' if huella else nombre
+    return os.path.join(_dir_adjuntos(), hashlib.sha256(clave.encode()).hexdigest() + '.pdf')
+
+def _huella(archivo):
+    # Hash del contenido (MetadatosAdjunto); la versión optimizada lleva el de su original
+    return getattr(getattr(archivo, 'instance', None), 'adjunto_sha256', '') or ''
+
+def _abrir_mmap(path):
+    with open(path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def olvidar(nombre, huella=''):
+    # Se llama cuando el FileField de un modelo cambia o se borra ('huella': su adjunto_sha256)
+    if not nombre: return
+    _borrar_copia(nombre)
+    if huella: _borrar_copia(nombre, huella)
+    # La versión con imágenes reducidas de un archivo sin analizar va por nombre (ver _clave)
+    try: os.remove(_ruta_reducida(nombre))
+    except FileNotFoundError: pass
+    cv_circuito.olvidar(nombre)
+
+def _borrar_copia(nombre, huella=''):
+    try: os.remove(_ruta_cache(nombre, huella))
+    except FileNotFoundError: pass
+
+
+def abrir(archivo):
+    # Devuelve un mmap del PDF (respaldado por un archivo en disco). Quien lo usa debe cerrarlo.
+    # 1. Archivo local: mmap, sin copiar el PDF a memoria ni pasar por HTTP
+    path = ruta_local(archivo)
+    if path:
+        _revisar_tamano(os.path.getsize(path))
+        return _abrir_mmap(path)
+
+    # 2. Copia local de un adjunto remoto ya descargado antes
+    cache = _ruta_cache(archivo.name, _huella(archivo))
+    try:
+        stream = _abrir_mmap(cache)
+        os.utime(cache)
+    except (FileNotFoundError, ValueError):
+        # ValueError: archivo vacío, mmap no lo acepta
+        pass
+    else:
+        _revisar_tamano(len(stream), stream)
+        return stream
+
+    # 3. Se baja directo a la caché en disco, por bloques y con tope de bytes
+    with escritura_atomica(cache) as f:
+        url = archivo.url
+        if url.startswith('http'):
+            # Storage remoto de verdad (Cloudinary): HTTP con la sesión compartida
+            total = descargar(url, f)
+        else:
+            # Cualquier otro backend: se lee a través del propio storage (nunca loopback al servidor)
+            with archivo.storage.open(archivo.name, 'rb') as origen:
+                total = copiar_limitado(origen.chunks(BLOQUE), f)
+    cv_metricas.anotar('adjuntos_descargados')
+    cv_metricas.anotar('bytes_descargados', total)
+    stream = _abrir_mmap(cache)
+    # Podar después de abrir: aunque el propio archivo salga desalojado, el mmap sigue siendo válido
+    podar(_dir_adjuntos(), settings.CV_ADJUNTOS_CACHE_MAX_BYTES)
+    return stream
+
+def _revisar_tamano(size, stream=None):
+    if size > settings.CV_ADJUNTO_MAX_BYTES:
+        if stream is not None: stream.close()
+        raise AdjuntoExcedido(f"más de {_mb(settings.CV_ADJUNTO_MAX_BYTES)}")
+
+# ==========================================
+# IMÁGENES REDUCIDAS (por archivo de origen)
+# ==========================================
+# Fotos de certificados escaneadas a 300-600 DPI: al anexarlas se bajan a CV_IMAGENES_MAX_DPI.
+# El resultado queda en la caché de adjuntos (mismo LRU) y el original no se toca.
+def _ruta_reducida(clave):
+    # Cambiar CV_IMAGENES_* no reutiliza versiones hechas con otra configuración
+    huella = f'{clave}|{settings.CV_IMAGENES_MAX_DPI}|{settings.CV_IMAGENES_CALIDAD}'
+    return os.path.join(_dir_adjuntos(), 'img-' + hashlib.sha256(huella.encode()).hexdigest() + '.pdf')
+
+def con_imagenes_reducidas(archivo, stream):
+    # Devuelve el PDF con las fotos reducidas o, si no hay nada que ganar, 'stream' tal cual.
+    # Un archivo vacío en la caché recuerda que este certificado no tiene nada que reducir.
+    if not settings.CV_IMAGENES_MAX_DPI:
+        return stream
+    path = _ruta_reducida(_clave(archivo))
+    if not os.path.exists(path):
+        try:
+            with escritura_atomica(path) as f:
+                reducidas = cv_optimizar.reducir_imagenes(
+                    stream, f, settings.CV_IMAGENES_MAX_DPI, settings.CV_IMAGENES_CALIDAD,
+                    comprobar=lambda: cv_admision.comprobar(settings.CV_PLAZO_RESERVA))
+                if reducidas and f.tell() >= len(stream):
+                    f.seek(0)
+                    f.truncate()
+        except Exception as e:
+            # Es una optimización: sin plazo o con un PDF raro se anexa el original
+            logger.info("No se redujeron las imágenes de %s: %s", archivo.name, e)
+            return stream
+        podar(_dir_adjuntos(), settings.CV_ADJUNTOS_CACHE_MAX_BYTES)
+
+    try:
+        os.utime(path)
+        reducido = _abrir_mmap(path)
+    except (FileNotFoundError, ValueError):
+        # ValueError: vacío (nada que reducir); FileNotFoundError: desalojado al podar
+        return stream
+    cv_metricas.anotar('bytes_ahorrados_imagenes', len(stream) - len(reducido))
+    stream.close()
+    return reducido
+
+def abrir_todos(archivos):
+    # Lectura en paralelo (pool acotado); devuelve los resultados EN EL MISMO ORDEN que 'archivos'.
+    # Cada posición es un stream o la excepción que impidió leerlo (AdjuntoExcedido, PlazoVencido, ...).
+    def _uno(archivo):
+        try:
+            return con_imagenes_reducidas(archivo, abrir(archivo))
+        except Exception as e:
+            return e
+
+    if not archivos:
+        return []
+    pool = ThreadPoolExecutor(max_workers=min(settings.CV_ADJUNTOS_WORKERS, len(archivos)))
+    # Cada hilo corre en una copia del contexto: sus anotaciones llegan a la medición y ve el plazo
+    futuros = [pool.submit(contextvars.copy_context().run, _uno, archivo) for archivo in archivos]
+    # No se espera más allá del plazo: lo que no llegó se cancela y el CV sale sin esos adjuntos.
+    # Las descargas en curso cortan en su siguiente bloque; no se las espera al cerrar el pool.
+    wait(futuros, timeout=_plazo_adjuntos())
+    pool.shutdown(wait=False, cancel_futures=True)
+    return [f.result() if f.done() and not f.cancelled() else cv_admision.PlazoVencido("no llegó a tiempo")
+            for f in futuros]
+
+def fallo(archivo, error):
+    # Un certificado que no se pudo anexar no tumba el CV: queda en el log y en la medición
+    logger.warning("Error adjuntando PDF %s: %s", archivo.name, error)
+    cv_metricas.anotar('adjuntos_fallidos', {'archivo': archivo.name, 'motivo': f'{type(error).__name__}: {error}'})
+
+
+# ==========================================
+# ANEXO DEL CV (con presupuesto)
+# ==========================================
+class Anexo:
+    # Certificados de un CV ya leídos y dentro del presupuesto de bytes/páginas y del plazo.
+    # Se arma ANTES de renderizar para que el índice de anexos muestre lo que quedó fuera:
+    #
+    #   anexo = cv_adjuntos.Anexo(archivos)
+    #   anexo.omitidos     -> {nombre: nota para el índice}
+    #   anexo.rangos(n)    -> [(desde, hasta) o None] por archivo, si el anexo empieza en la página n
+    #   anexo.paginas()    -> páginas a agregar, en el orden de 'archivos' (cierra los streams)
+    def __init__(self, archivos):
+        self.archivos = archivos
+        self.omitidos = {}
+        self._fallos = {}
+        # True si algún certificado no llegó a leerse por el plazo de ESTA petición: ese PDF sirve
+        # para esta respuesta pero no se guarda en la caché
+        self.incompleto = False
+        # Si alguno falló o tiene el circuito abierto, el índice ya dice "No disponible" y el PDF
+        # se puede guardar, pero solo hasta 'vence' (timestamp): entonces se vuelve a intentar
+        self.vence = None
+        self._lectores = {}
+        self._streams = []
+        try:
+            self._cargar()
+        except BaseException:
+            self.close()
+            raise
+
+    def _cargar(self):
+        # Un mismo certificado que aparece dos veces se lee, se parsea y se cuenta una sola vez
+        primeros = {}
+        for archivo in self.archivos:
+            primeros.setdefault(_clave(archivo), archivo)
+        # Con los metadatos del archivo (calculados al subirlo) se descarta sin leerlo lo que
+        # está dañado o no entra en el presupuesto por certificado
+        unicos = {clave: archivo for clave, archivo in primeros.items() if not self._descartar(archivo)}
+        # Los que fallan seguido (circuito abierto) ni se intentan: no se espera su timeout
+        self._fallos = cv_circuito.estados([archivo.name for archivo in unicos.values()])
+        bloqueados = {nombre for nombre, registro in self._fallos.items() if cv_circuito.abierto(registro)}
+        a_leer = [archivo for archivo in unicos.values() if archivo.name not in bloqueados]
+        leidos = dict(zip([archivo.name for archivo in a_leer], abrir_todos(a_leer)))
+
+        total_bytes = total_paginas = 0
+        for clave, archivo in unicos.items():
+            if archivo.name in bloqueados:
+                self._bloqueado(archivo)
+                continue
+            stream = leidos[archivo.name]
+            if isinstance(stream, AdjuntoExcedido):
+                # El origen responde (solo que no entra): para el circuito cuenta como que funciona
+                self._funciona(archivo)
+                self._omitir(archivo, str(stream))
+                continue
+            if isinstance(stream, Exception):
+                self._no_disponible(archivo, stream)
+                continue
+            self._streams.append(stream)
+            try:
+                lector = PdfReader(stream)
+                n = len(lector.pages)
+            except Exception as e:
+                self._no_disponible(archivo, e)
+                continue
+
+            # En orden: los primeros certificados tienen prioridad sobre el presupuesto total
+            if n > settings.CV_ADJUNTO_MAX_PAGINAS:
+                self._omitir(archivo, f"{n} páginas (máx. {settings.CV_ADJUNTO_MAX_PAGINAS})")
+            elif (total_bytes + len(stream) > settings.CV_ANEXO_MAX_BYTES
+                  or total_paginas + n > settings.CV_ANEXO_MAX_PAGINAS):
+                self._omitir(archivo, "supera el tamaño máximo del anexo")
+            else:
+                total_bytes += len(stream)
+                total_paginas += n
+                self._lectores[clave] = lector
+            self._funciona(archivo)
+        cv_metricas.anotar('bytes_anexo', total_bytes)
+
+        # Las copias con otro nombre y el mismo contenido llevan la misma nota en el índice
+        for archivo in self.archivos:
+            nota = self.omitidos.get(primeros[_clave(archivo)].name)
+            if nota: self.omitidos[archivo.name] = nota
+
+    def _descartar(self, archivo):
+        meta = getattr(archivo, 'instance', None)
+        if getattr(meta, 'adjunto_valido', None) is False:
+            # Ya se sabe que está dañado: no se descarga ni cuenta para el circuito, y el CV
+            # sale igual en cada intento (se puede guardar en la caché)
+            cv_metricas.anotar('adjuntos_omitidos', {'archivo': archivo.name, 'motivo': 'archivo dañado'})
+            self.omitidos[archivo.name] = "No disponible: archivo dañado"
+            return True
+        if (getattr(meta, 'adjunto_optimizado_bytes', None) or getattr(meta, 'adjunto_bytes', None) or 0) > settings.CV_ADJUNTO_MAX_BYTES:
+            self._omitir(archivo, f"más de {_mb(settings.CV_ADJUNTO_MAX_BYTES)}")
+            return True
+        paginas = getattr(meta, 'adjunto_paginas', None) or 0
+        if paginas > settings.CV_ADJUNTO_MAX_PAGINAS:
+            self._omitir(archivo, f"{paginas} páginas (máx. {settings.CV_ADJUNTO_MAX_PAGINAS})")
+            return True
+        return False
+
+    def _omitir(self, archivo, motivo):
+        logger.info("Certificado omitido del anexo %s: %s", archivo.name, motivo)
+        cv_metricas.anotar('adjuntos_omitidos', {'archivo': archivo.name, 'motivo': motivo})
+        self.omitidos[archivo.name] = f"Omitido: {motivo}"
+
+    def _no_disponible(self, archivo, error):
+        fallo(archivo, error)
+        if isinstance(error, cv_admision.PlazoVencido):
+            # El plazo es de esta petición, no culpa del certificado: no cuenta para el circuito
+            # y la próxima petición puede tener más suerte
+            self.incompleto = True
+            self.omitidos[archivo.name] = "No disponible: se agotó el tiempo"
+            return
+        # Una copia local corrupta no debe repetirse: el próximo intento vuelve al storage
+        _borrar_copia(archivo.name, _huella(archivo))
+        registro = cv_circuito.fallo(archivo, error, self._fallos.get(archivo.name))
+        # Si con este fallo se abrió el circuito, no se reintenta antes de 'bloqueado_hasta'
+        if registro.bloqueado_hasta is not None:
+            self._reintentar(registro.bloqueado_hasta.timestamp())
+        else:
+            self._reintentar(time.time() + settings.CV_CIRCUITO_ESPERA)
+        self.omitidos[archivo.name] = "No disponible: no se pudo leer"
+
+    def _funciona(self, archivo):
+        if archivo.name in self._fallos:
+            cv_circuito.exito(self._fallos[archivo.name])
+
+    def _bloqueado(self, archivo):
+        cv_metricas.anotar('adjuntos_bloqueados', {'archivo': archivo.name,
+                                                   'hasta': self._fallos[archivo.name].bloqueado_hasta.isoformat()})
+        self._reintentar(self._fallos[archivo.name].bloqueado_hasta.timestamp())
+        self.omitidos[archivo.name] = "No disponible: falla repetidamente"
+
+    def _reintentar(self, cuando):
+        self.vence = cuando if self.vence is None else min(self.vence, cuando)
+
+    def rangos(self, primera):
+        # Páginas del CV que ocupa cada certificado (en el orden de 'archivos'; None si no se
+        # anexa), sabiendo que el anexo empieza en la página 'primera'
+        rangos = []
+        for archivo in self.archivos:
+            lector = self._lectores.get(_clave(archivo))
+            if lector is None:
+                rangos.append(None)
+                continue
+            rangos.append((primera, primera + len(lector.pages) - 1))
+            primera += len(lector.pages)
+        return rangos
+
+    def paginas(self):
+        # Al terminar (o si se abandona) se cierran los streams: PdfWriter ya copió las páginas
+        try:
+            for archivo in self.archivos:
+                lector = self._lectores.get(_clave(archivo))
+                if lector is not None:
+                    yield from lector.pages
+        finally:
+            self.close()
+
+    def close(self):
+        for stream in self._streams:
+            stream.close()
+        self._streams = []
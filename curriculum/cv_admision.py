@@ -0,0 +1,179 @@
+# curriculum/cv_admision.py
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:
+    # Windows (solo desarrollo): queda el límite por proceso, sin cupos compartidos ni coalescencia
+    fcntl = None
+
+# Control de admisión para los renders de PDF:
+#   - cupo(): como mucho CV_RENDER_MAX_POR_PROCESO renders por proceso y CV_RENDER_MAX_GLOBAL
+#     entre todos los workers de gunicorn (flock sobre CV_CACHE_DIR/admision/cupo-N.lock;
+#     si un worker muere, el sistema operativo suelta su cupo).
+#   - en_vuelo(clave): peticiones idénticas (misma clave de caché) esperan al primer render en
+#     lugar de repetirlo; al entrar encuentran el PDF en la caché.
+#   - cupo_fondo(): los trabajos en segundo plano esperan sin límite, pero usan como mucho
+#     CV_RENDER_MAX_POR_PROCESO - 1 cupos por proceso y CV_RENDER_MAX_GLOBAL - 1 entre todos
+#     (flock sobre admision/fondo-N.lock). La reserva para las peticiones síncronas solo existe
+#     con ambos límites en 2 o más: con 1 el trabajo ocupa el único cupo mientras renderiza.
+# Quien no consigue turno antes de CV_RENDER_ESPERA segundos recibe Ocupado (la vista da 503).
+#
+# Además cada petición tiene UN plazo total (plazo(), CV_PLAZO) que comparten todas las etapas:
+# la espera de turno, la descarga de adjuntos y el render. Vive en un contextvar, así que llega
+# también a los hilos que leen los adjuntos.
+INTERVALO = 0.1
+# Los locks de en_vuelo() usan los 2 primeros caracteres de la clave (256 archivos): dos
+# variantes que caen en el mismo archivo solo se esperan entre sí, y no se acumula un archivo por variante.
+_PREFIJO = 2
+
+_semaforo = None
+_semaforo_fondo = None
+_semaforo_lock = threading.Lock()
+_plazo = contextvars.ContextVar('cv_plazo', default=None)
+
+
+class Ocupado(Exception):
+    pass
+
+class PlazoVencido(Exception):
+    pass
+
+
+# ==========================================
+# PLAZO DE LA PETICIÓN
+# ==========================================
+@contextmanager
+def plazo(segundos):
+    # segundos=None (o 0): sin plazo, como en los trabajos en segundo plano y calentar_cv
+    token = _plazo.set(time.monotonic() + segundos if segundos else None)
+    try:
+        yield
+    finally:
+        _plazo.reset(token)
+
+def restante(reserva=0):
+    # Segundos que quedan del plazo (descontando 'reserva'), o None si no hay plazo
+    hasta = _plazo.get()
+    return None if hasta is None else max(0.0, hasta - reserva - time.monotonic())
+
+def comprobar(reserva=0):
+    if restante(reserva) == 0:
+        raise PlazoVencido("se agotó el tiempo de la petición")
+
+def limite():
+    # Instante (monotonic) hasta el que una petición puede esperar turno
+    hasta = time.monotonic() + settings.CV_RENDER_ESPERA
+    return hasta if _plazo.get() is None else min(hasta, _plazo.get())
+
+def _semaforo_proceso():
+    global _semaforo
+    with _semaforo_lock:
+        if _semaforo is None:
+            _semaforo = threading.BoundedSemaphore(settings.CV_RENDER_MAX_POR_PROCESO)
+    return _semaforo
+
+def _semaforo_fondo_proceso():
+    # Con CV_RENDER_MAX_POR_PROCESO = 1 no se puede reservar nada: queda en 1 para que los
+    # trabajos no se queden esperando para siempre
+    global _semaforo_fondo
+    with _semaforo_lock:
+        if _semaforo_fondo is None:
+            _semaforo_fondo = threading.BoundedSemaphore(max(1, settings.CV_RENDER_MAX_POR_PROCESO - 1))
+    return _semaforo_fondo
+
+def _dir_admision():
+    path = os.path.join(settings.CV_CACHE_DIR, 'admision')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def _restante(hasta):
+    return None if hasta is None else max(0, hasta - time.monotonic())
+
+
+# ==========================================
+# LOCKS DE ARCHIVO
+# ==========================================
+def _tomar(paths, hasta):
+    # Intenta tomar cualquiera de 'paths' (flock exclusivo) hasta el instante 'hasta'
+    # (None = sin límite). Devuelve el fd tomado o None.
+    fds = [os.open(path, os.O_RDWR | os.O_CREAT, 0o600) for path in paths]
+    try:
+        while True:
+            for fd in fds:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                fds.remove(fd)
+                return fd
+            if hasta is not None and time.monotonic() >= hasta:
+                return None
+            time.sleep(INTERVALO)
+    finally:
+        for fd in fds: os.close(fd)
+
+def _soltar(fd):
+    fcntl.flock(fd, fcntl.LOCK_UN)
+    os.close(fd)
+
+
+# ==========================================
+# API
+# ==========================================
+@contextmanager
+def en_vuelo(clave, hasta=None):
+    if fcntl is None:
+        yield
+        return
+    path = os.path.join(_dir_admision(), f'vuelo-{clave[:_PREFIJO]}.lock')
+    fd = _tomar([path], hasta)
+    if fd is None:
+        raise Ocupado()
+    try:
+        yield
+    finally:
+        _soltar(fd)
+
+@contextmanager
+def cupo(hasta=None):
+    semaforo = _semaforo_proceso()
+    if not semaforo.acquire(timeout=_restante(hasta)):
+        raise Ocupado()
+    try:
+        if fcntl is None:
+            yield
+            return
+        paths = [os.path.join(_dir_admision(), f'cupo-{i}.lock') for i in range(settings.CV_RENDER_MAX_GLOBAL)]
+        fd = _tomar(paths, hasta)
+        if fd is None:
+            raise Ocupado()
+        try:
+            yield
+        finally:
+            _soltar(fd)
+    finally:
+        semaforo.release()
+
+@contextmanager
+def cupo_fondo():
+    # Primero el cupo de los trabajos (proceso y global) y recién después el común: mientras un
+    # trabajo espera turno no ocupa nada que necesite una petición síncrona
+    with _semaforo_fondo_proceso():
+        if fcntl is None:
+            with cupo():
+                yield
+            return
+        paths = [os.path.join(_dir_admision(), f'fondo-{i}.lock') for i in range(max(1, settings.CV_RENDER_MAX_GLOBAL - 1))]
+        fd = _tomar(paths, None)
+        try:
+            with cupo():
+                yield
+        finally:
+            _soltar(fd)
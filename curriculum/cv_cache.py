@@ -0,0 +1,217 @@
+# curriculum/cv_cache.py
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Modelos cuyo contenido termina dentro del CV en PDF.
+# Guardar o borrar cualquiera de ellos cambia la "versión de datos" y vacía la caché.
+MODELOS_CV = (
+    'DatosPersonales', 'ExperienciaLaboral', 'EstudioRealizado', 'CursoCapacitacion',
+    'Reconocimiento', 'ProductoLaboral', 'VentaGarage', 'ProductoAcademico',
+)
+
+
+# ==========================================
+# RUTAS
+# ==========================================
+def _dir_pdfs():
+    path = os.path.join(settings.CV_CACHE_DIR, 'pdf')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def _ruta_version():
+    os.makedirs(settings.CV_CACHE_DIR, exist_ok=True)
+    return os.path.join(settings.CV_CACHE_DIR, 'version')
+
+@contextmanager
+def escritura_atomica(path):
+    # Escribimos en un temporal y renombramos: otro worker nunca ve un archivo a medias.
+    # Si el bloque lanza una excepción el temporal se borra y 'path' queda como estaba.
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp): os.remove(tmp)
+        raise
+
+def escribir_atomico(path, contenido):
+    # 'contenido' puede ser bytes o un archivo abierto (se copia por bloques y se rebobina).
+    with escritura_atomica(path) as f:
+        if hasattr(contenido, 'read'):
+            contenido.seek(0)
+            shutil.copyfileobj(contenido, f)
+            contenido.seek(0)
+        else:
+            f.write(contenido)
+
+
+# ==========================================
+# VERSIÓN DE DATOS
+# ==========================================
+def version_datos():
+    # Se guarda en disco (y no en memoria) para que todos los workers de gunicorn la compartan.
+    # Si no existe se crea con un valor único: una carpeta de caché nueva (deploy) nunca
+    # repite la versión, ni los ETag, de una anterior.
+    try:
+        with open(_ruta_version()) as f:
+            return f.read().strip() or '0'
+    except FileNotFoundError:
+        version = str(time.time_ns())
+        escribir_atomico(_ruta_version(), version.encode())
+        return version
+
+def fecha_version():
+    # Momento del último cambio en los datos del CV (timestamp), para Last-Modified
+    version_datos()
+    return int(os.stat(_ruta_version()).st_mtime)
+
+def invalidar(**kwargs):
+    # Firma compatible con post_save / post_delete
+    escribir_atomico(_ruta_version(), str(time.time_ns()).encode())
+    # Solo los CVs y sus vencimientos: los '.tmp-*' son de un guardar() en curso (otro hilo u
+    # otro worker) y borrarlos le haría fallar el os.replace
+    for nombre in os.listdir(_dir_pdfs()):
+        if not nombre.endswith(('.pdf', '.vence')): continue
+        try: os.remove(os.path.join(_dir_pdfs(), nombre))
+        except FileNotFoundError: pass
+
+
+# ==========================================
+# CACHÉ DE CVs TERMINADOS (LRU en disco)
+# ==========================================
+def clave_cv(filtros, styles, version=None):
+    # La versión se lee ANTES de renderizar: si los datos cambian a mitad de camino,
+    # el PDF queda guardado con la versión vieja y nunca se vuelve a servir.
+    payload = json.dumps({
+        'filtros': filtros,
+        'styles': styles,
+        'version': version if version is not None else version_datos(),
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def _ruta_vence(path):
+    # Junto a un PDF que le falta algún certificado: hasta cuándo vale (timestamp)
+    return path[:-len('.pdf')] + '.vence'
+
+def _vencido(path):
+    try:
+        with open(_ruta_vence(path)) as f:
+            return float(f.read()) <= time.time()
+    except FileNotFoundError:
+        return False
+    except ValueError:
+        return True
+
+def abrir(clave):
+    # Devuelve el PDF en caché como archivo abierto (quien lo usa lo cierra) o None
+    path = os.path.join(_dir_pdfs(), f'{clave}.pdf')
+    if _vencido(path):
+        # Toca volver a intentar los certificados que faltaban
+        for ruta in (path, _ruta_vence(path)):
+            try: os.remove(ruta)
+            except FileNotFoundError: pass
+        return None
+    try:
+        archivo = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    # Marcamos el acceso para el desalojo LRU
+    try: os.utime(path)
+    except FileNotFoundError: pass
+    return archivo
+
+def guardar(clave, contenido):
+    # Un CV incompleto (construir_cv marca .incompleto si faltó algún certificado por el plazo)
+    # no se guarda nunca: se serviría a todos hasta el próximo cambio de datos. Si lleva .vence
+    # (algún certificado falló), vale hasta ese momento. Devuelve True si quedó en la caché.
+    if getattr(contenido, 'incompleto', False):
+        return False
+    path = os.path.join(_dir_pdfs(), f'{clave}.pdf')
+    vence = getattr(contenido, 'vence', None)
+    try:
+        if vence is not None:
+            escribir_atomico(_ruta_vence(path), str(vence).encode())
+        else:
+            try: os.remove(_ruta_vence(path))
+            except FileNotFoundError: pass
+        escribir_atomico(path, contenido)
+    except FileNotFoundError as e:
+        # Alguien vació la carpeta mientras escribíamos: el CV ya se sirvió, solo queda sin caché
+        logger.warning("No se pudo guardar el CV %s en la caché: %s", clave, e)
+        return False
+    podar(_dir_pdfs(), settings.CV_PDF_CACHE_MAX_BYTES, settings.CV_PDF_CACHE_MAX_ENTRIES)
+    return True
+
+def podar(directorio, max_bytes, max_entradas=None):
+    # Desalojo LRU común a todas las cachés en disco (el mtime marca el último uso)
+    entradas = []
+    for nombre in os.listdir(directorio):
+        if not nombre.endswith('.pdf'): continue
+        path = os.path.join(directorio, nombre)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entradas.append((st.st_mtime, st.st_size, path))
+
+    # Los menos usados primero
+    entradas.sort()
+    total = sum(size for _, size, _ in entradas)
+    while entradas and (total > max_bytes or (max_entradas is not None and len(entradas) > max_entradas)):
+        _, size, path = entradas.pop(0)
+        for ruta in (path, _ruta_vence(path)):
+            try: os.remove(ruta)
+            except FileNotFoundError: pass
+        total -= size
+
+
+# ==========================================
+# CACHÉ DE SECCIONES (fragmentos de render_part)
+# ==========================================
+# Cada sección se guarda por separado con una huella de SOLO los datos que usa: editar un
+# curso vuelve a renderizar 'courses_list' y 'certificates_index', el resto se reutiliza.
+# No depende de version_datos(), así que no se vacía con cada cambio.
+def _dir_secciones():
+    path = os.path.join(settings.CV_CACHE_DIR, 'secciones')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def _huella(valor):
+    # Modelos y listas/querysets de modelos -> todos sus campos; el resto tal cual
+    if hasattr(valor, '_meta'):
+        return [valor._meta.label, [(f.attname, f.value_from_object(valor)) for f in valor._meta.concrete_fields]]
+    if isinstance(valor, dict):
+        return {k: _huella(v) for k, v in valor.items()}
+    if hasattr(valor, '__iter__') and not isinstance(valor, str):
+        return [_huella(v) for v in valor]
+    return valor
+
+def clave_seccion(modo, datos):
+    payload = json.dumps({'modo': modo, 'datos': _huella(datos)}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def leer_seccion(clave):
+    path = os.path.join(_dir_secciones(), f'{clave}.pdf')
+    try:
+        with open(path, 'rb') as f:
+            contenido = f.read()
+    except FileNotFoundError:
+        return None
+    try: os.utime(path)
+    except FileNotFoundError: pass
+    return contenido
+
+def guardar_seccion(clave, contenido):
+    escribir_atomico(os.path.join(_dir_secciones(), f'{clave}.pdf'), contenido)
+    podar(_dir_secciones(), settings.CV_SECCIONES_CACHE_MAX_BYTES)
@@ -0,0 +1,77 @@
+# curriculum/cv_circuito.py
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+from . import cv_cache
+from .models import FalloAdjunto
+
+logger = logging.getLogger(__name__)
+
+# Memoria de fallos de certificados (circuit breaker), guardada en la BD para que la compartan
+# todos los workers y se vea en el admin:
+#   - cada fallo al leer un certificado suma uno a sus 'fallos' seguidos;
+#   - desde CV_CIRCUITO_UMBRAL fallos el circuito se abre: el CV lo salta sin intentarlo hasta
+#     'bloqueado_hasta' (CV_CIRCUITO_ESPERA, duplicándose en cada fallo hasta CV_CIRCUITO_ESPERA_MAX);
+#   - pasado ese tiempo se vuelve a intentar una vez; si funciona, el registro se borra.
+# Los CVs que salieron sin el certificado se guardan en la caché hasta el próximo intento
+# (Anexo.vence); cuando el certificado vuelve a funcionar se invalida la caché entera, para
+# que cambie también el ETag que ya tienen los navegadores y las CDN.
+# Solo se llama desde el hilo de la petición (nunca desde los hilos que descargan).
+
+
+def estados(nombres):
+    # {nombre: FalloAdjunto} de los certificados de este CV que tienen fallos registrados
+    try:
+        return {f.nombre: f for f in FalloAdjunto.objects.filter(nombre__in=nombres)}
+    except DatabaseError as e:
+        # Sin la tabla (migración pendiente) o sin BD el CV se genera igual, sin circuito
+        logger.warning("No se pudo leer el circuito de certificados: %s", e)
+        return {}
+
+def abierto(registro, ahora=None):
+    return registro.bloqueado_hasta is not None and registro.bloqueado_hasta > (ahora or timezone.now())
+
+def fallo(archivo, error, registro=None):
+    ahora = timezone.now()
+    if registro is None:
+        registro = FalloAdjunto(nombre=archivo.name, primer_fallo=ahora)
+    instancia = getattr(archivo, 'instance', None)
+    if instancia is not None:
+        registro.modelo, registro.objeto_id = instancia._meta.label, instancia.pk
+    try:
+        registro.url = archivo.url[:500]
+    except Exception:
+        pass
+    registro.fallos += 1
+    registro.ultimo_error = f'{type(error).__name__}: {error}'
+    registro.ultimo_fallo = ahora
+    if registro.fallos >= settings.CV_CIRCUITO_UMBRAL:
+        espera = settings.CV_CIRCUITO_ESPERA * 2 ** (registro.fallos - settings.CV_CIRCUITO_UMBRAL)
+        registro.bloqueado_hasta = ahora + timedelta(seconds=min(espera, settings.CV_CIRCUITO_ESPERA_MAX))
+        logger.warning("Certificado %s bloqueado hasta %s tras %s fallos seguidos",
+                       archivo.name, registro.bloqueado_hasta, registro.fallos)
+    try:
+        registro.save()
+    except DatabaseError as e:
+        logger.warning("No se pudo guardar el fallo de %s: %s", archivo.name, e)
+    return registro
+
+def exito(registro):
+    # El certificado volvió a funcionar: se cierra el circuito y se descartan los CVs que lo
+    # daban por "No disponible" (tienen la misma clave que los nuevos, así que no basta su vencimiento)
+    try:
+        registro.delete()
+    except DatabaseError:
+        return
+    cv_cache.invalidar()
+
+def olvidar(nombre):
+    # El admin reemplazó o quitó el archivo: lo que se sabía de él ya no aplica
+    try:
+        FalloAdjunto.objects.filter(nombre=nombre).delete()
+    except DatabaseError:
+        pass
@@ -0,0 +1,132 @@
+# curriculum/cv_metricas.py
+import contextvars
+import json
+import logging
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Medición de las etapas del generador de PDF. No cuesta nada si no hay una medición activa:
+#
+#   with cv_metricas.medir() as m:
+#       construir_cv(...)
+#   m.etapas  -> {'pisa': {'wall_ms': .., 'cpu_ms': .., 'pico_kb': .., 'veces': ..}, ...}
+#   m.datos   -> contadores anotados durante el render (páginas, bytes, ...)
+_actual = contextvars.ContextVar('cv_metricas', default=None)
+logger = logging.getLogger(__name__)
+
+
+class Medicion:
+    def __init__(self, memoria=False):
+        # memoria=True requiere tracemalloc activo (lento: solo para benchmarks)
+        self.memoria = memoria and tracemalloc.is_tracing()
+        self.etapas = {}
+        self.datos = {}
+        # Etapas abiertas con memoria: [pico] de cada una, para no perderlo al anidar
+        self._abiertas = []
+        # Los adjuntos se leen en varios hilos que anotan sobre la misma medición
+        self._lock = threading.Lock()
+
+    def sumar(self, nombre, wall, cpu, pico=None):
+        with self._lock:
+            self._sumar(nombre, wall, cpu, pico)
+
+    def _sumar(self, nombre, wall, cpu, pico):
+        etapa = self.etapas.setdefault(nombre, {'wall_ms': 0.0, 'cpu_ms': 0.0, 'veces': 0})
+        etapa['wall_ms'] += wall * 1000
+        etapa['cpu_ms'] += cpu * 1000
+        etapa['veces'] += 1
+        if pico is not None:
+            etapa['pico_kb'] = max(etapa.get('pico_kb', 0), pico // 1024)
+
+    def _volcar_pico(self):
+        # tracemalloc tiene UN solo pico global: antes de reiniciarlo (o al cerrar una etapa) se
+        # pasa a todas las etapas abiertas, así 'total' nunca queda por debajo de 'pisa'
+        actual = tracemalloc.get_traced_memory()[1]
+        for abierta in self._abiertas:
+            abierta[0] = max(abierta[0], actual)
+
+    def abrir_pico(self):
+        with self._lock:
+            self._volcar_pico()
+            tracemalloc.reset_peak()
+            registro = [0]
+            self._abiertas.append(registro)
+            return registro
+
+    def cerrar_pico(self, registro):
+        # Por identidad: con varios hilos las etapas no siempre cierran en orden
+        with self._lock:
+            self._volcar_pico()
+            self._abiertas = [abierta for abierta in self._abiertas if abierta is not registro]
+            return registro[0]
+
+    def anotar(self, clave, valor=1):
+        # Números se acumulan; cualquier otro valor se agrega a una lista
+        with self._lock:
+            if isinstance(valor, (int, float)):
+                self.datos[clave] = self.datos.get(clave, 0) + valor
+            else:
+                self.datos.setdefault(clave, []).append(valor)
+
+
+@contextmanager
+def medir(memoria=False):
+    medicion = Medicion(memoria)
+    token = _actual.set(medicion)
+    try:
+        yield medicion
+    finally:
+        _actual.reset(token)
+
+def activa():
+    return _actual.get()
+
+@contextmanager
+def etapa(nombre):
+    medicion = _actual.get()
+    if medicion is None:
+        yield
+        return
+    registro = medicion.abrir_pico() if medicion.memoria else None
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        pico = medicion.cerrar_pico(registro) if registro is not None else None
+        medicion.sumar(nombre, time.perf_counter() - wall, time.process_time() - cpu, pico)
+
+def anotar(clave, valor=1):
+    medicion = _actual.get()
+    if medicion is not None:
+        medicion.anotar(clave, valor)
+
+def fijar(clave, valor):
+    # Como anotar(), pero reemplaza el valor (p. ej. 'cache': 'hit')
+    medicion = _actual.get()
+    if medicion is not None:
+        medicion.datos[clave] = valor
+
+
+# ==========================================
+# SALIDA: CABECERA Y LOG
+# ==========================================
+def server_timing(medicion):
+    # "consultas;dur=4.2, pisa;dur=812.0, ..., cache;desc=miss" (se ve en las DevTools del navegador)
+    partes = [f"{nombre};dur={e['wall_ms']:.1f}" for nombre, e in medicion.etapas.items()]
+    if 'cache' in medicion.datos:
+        partes.append(f"cache;desc={medicion.datos['cache']}")
+    return ', '.join(partes)
+
+def registrar(medicion, evento, **contexto):
+    # Un registro por CV. El mensaje es JSON (fácil de filtrar en los logs de la plataforma)
+    # y el dict va también en record.cv para handlers que lo quieran estructurado.
+    registro = {
+        'evento': evento, **contexto,
+        'ms': {nombre: round(e['wall_ms'], 1) for nombre, e in medicion.etapas.items()},
+        'cpu_ms': {nombre: round(e['cpu_ms'], 1) for nombre, e in medicion.etapas.items()},
+        **medicion.datos,
+    }
+    nivel = logging.WARNING if medicion.datos.get('adjuntos_fallidos') else logging.INFO
+    logger.log(nivel, json.dumps(registro, default=str, ensure_ascii=False), extra={'cv': registro})
@@ -0,0 +1,318 @@
+# curriculum/cv_optimizar.py
+import functools
+import hashlib
+import logging
+import math
+import os
+import queue
+import tempfile
+import threading
+import warnings
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from PIL import Image
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import ArrayObject, ByteStringObject, DictionaryObject, IndirectObject, NameObject, StreamObject
+
+try:
+    import pikepdf
+    # Los formularios de algunos certificados pierden su /AcroForm al copiar las páginas (pypdf);
+    # qpdf avisa en cada guardado, pero el CV se ve igual
+    warnings.filterwarnings('ignore', category=pikepdf.PageCopyWarning)
+except ImportError:
+    # Opcional (requirements.txt): sin pikepdf el CV sale igual, solo que sin linealizar
+    pikepdf = None
+
+from . import cv_adjuntos
+
+logger = logging.getLogger(__name__)
+
+# Versión optimizada de los PDF subidos en el admin (escaneos con streams sin comprimir y
+# objetos repetidos). Se genera en un hilo después del commit, así el guardado no espera:
+#   - streams de contenido e imágenes sin filtro -> Flate
+#   - fuentes e imágenes que la página no usa -> fuera
+#   - objetos idénticos -> uno solo; los que quedan sin referencia -> fuera
+# Se guarda en el storage junto al original (campo adjunto_optimizado) y el anexo del CV la usa
+# en su lugar (cv_adjuntos.para_anexo). El original no se toca.
+#
+# Aparte, reducir_imagenes() baja la resolución de las fotos que trae un certificado; se aplica
+# al anexarlo (cv_adjuntos) y el resultado queda en la caché de adjuntos.
+_USOS = {b'Do': '/XObject', b'Tf': '/Font'}
+
+_cola = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+_sin_pikepdf_avisado = False
+
+
+# ==========================================
+# OPTIMIZACIÓN
+# ==========================================
+def optimizar(origen, destino):
+    # Lee el PDF de 'origen' y escribe la versión optimizada en 'destino' (archivos abiertos)
+    writer = PdfWriter(clone_from=PdfReader(origen))
+    for pagina in writer.pages:
+        try:
+            _quitar_recursos_sin_uso(pagina)
+        except Exception as e:
+            # Contenido que no se puede interpretar: la página queda con sus recursos
+            logger.debug("No se pudieron revisar los recursos de una página: %s", e)
+        pagina.compress_content_streams(level=9)
+    _comprimir_imagenes(writer)
+    writer.compress_identical_objects(remove_identicals=True, remove_orphans=True)
+    writer.write(destino)
+
+def _quitar_recursos_sin_uso(pagina):
+    recursos = pagina.get('/Resources')
+    contenido = pagina.get_contents()
+    if recursos is None or contenido is None:
+        return
+    recursos = recursos.get_object()
+    usados = {'/XObject': set(), '/Font': set()}
+    for operandos, operador in contenido.operations:
+        if operador in _USOS and operandos:
+            usados[_USOS[operador]].add(operandos[0])
+
+    xobjects = recursos.get('/XObject')
+    for nombre in usados['/XObject']:
+        xobject = xobjects.get_object().get(nombre) if xobjects else None
+        # Un formulario sin /Resources propios usa los de la página: no se sabe qué necesita
+        if xobject is not None and xobject.get_object().get('/Subtype') == '/Form' and '/Resources' not in xobject.get_object():
+            return
+
+    # Copia: varias páginas pueden compartir el mismo diccionario de recursos
+    nuevos = DictionaryObject(recursos)
+    for tipo, nombres in usados.items():
+        if tipo in nuevos:
+            actuales = nuevos[tipo].get_object()
+            nuevos[NameObject(tipo)] = DictionaryObject({k: v for k, v in actuales.items() if k in nombres})
+    pagina[NameObject('/Resources')] = nuevos
+
+def _comprimir_imagenes(writer):
+    for pagina in writer.pages:
+        recursos = pagina.get('/Resources')
+        xobjects = recursos.get_object().get('/XObject') if recursos is not None else None
+        if not xobjects:
+            continue
+        for ref in xobjects.get_object().values():
+            if isinstance(ref, IndirectObject) and '/Filter' not in ref.get_object():
+                writer._replace_object(ref, ref.get_object().flate_encode(level=9))
+
+
+def optimizar_salida(writer):
+    # Pasada final sobre el CV armado: cada sección de xhtml2pdf trae sus propias copias de las
+    # fuentes y las imágenes, y los anexos arrastran objetos que ninguna página usa. Los objetos
+    # idénticos quedan uno solo (compartido entre páginas) y los streams de contenido (incluido
+    # el número de página) van comprimidos. Devuelve (objetos antes, objetos después).
+    antes = sum(obj is not None for obj in writer._objects)
+    for pagina in writer.pages:
+        pagina.compress_content_streams(level=9)
+    writer.compress_identical_objects(remove_identicals=True, remove_orphans=True)
+    return antes, sum(obj is not None for obj in writer._objects)
+
+
+def hacer_determinista(writer, fecha):
+    # Mismos datos -> mismos bytes (caché por hash, ETag, CDN). Lo único que cambia entre
+    # renders idénticos es:
+    #   - el nombre de las imágenes de xhtml2pdf: ReportLab lo saca del archivo temporal donde se
+    #     copió la imagen (/FormXob.<md5 de la ruta>); se renombran con el hash del contenido;
+    #   - fecha e /ID del documento: la fecha es la de la versión de datos y el /ID un hash de
+    #     los streams del PDF ya terminado.
+    for pagina in writer.pages:
+        _renombrar_imagenes(pagina)
+    sello = fecha.strftime("D:%Y%m%d%H%M%S+00'00'")
+    writer.add_metadata({'/CreationDate': sello, '/ModDate': sello})
+
+    h = hashlib.md5(sello.encode(), usedforsecurity=False)
+    for obj in writer._objects:
+        if isinstance(obj, StreamObject):
+            h.update(obj._data)
+    identificador = ByteStringObject(h.hexdigest().encode())
+    writer._ID = ArrayObject([identificador, identificador])
+
+def _renombrar_imagenes(pagina):
+    recursos = pagina.get('/Resources')
+    xobjects = recursos.get_object().get('/XObject') if recursos is not None else None
+    if not xobjects:
+        return
+    xobjects = xobjects.get_object()
+    nombres = {nombre: f"/FormXob.{hashlib.md5(ref.get_object()._data, usedforsecurity=False).hexdigest()}"
+               for nombre, ref in xobjects.items()
+               if nombre.startswith('/FormXob.') and isinstance(ref.get_object(), StreamObject)}
+    nombres = {viejo: nuevo for viejo, nuevo in nombres.items() if viejo != nuevo}
+    if not nombres:
+        return
+    # Los nombres tienen 32 hex: reemplazarlos en los bytes del contenido no toca nada más
+    contenido = pagina.get_contents()
+    datos = contenido.get_data()
+    for viejo, nuevo in nombres.items():
+        datos = datos.replace(viejo.encode(), nuevo.encode())
+    contenido.set_data(datos)
+    pagina.replace_contents(contenido)
+    # Copias: otras páginas pueden compartir estos diccionarios con su propio contenido
+    nuevos = DictionaryObject(xobjects)
+    for viejo, nuevo in nombres.items():
+        nuevos[NameObject(nuevo)] = nuevos.pop(viejo)
+    recursos = DictionaryObject(recursos.get_object())
+    recursos[NameObject('/XObject')] = nuevos
+    pagina[NameObject('/Resources')] = recursos
+
+
+def linealizar(origen, destino, determinista=False):
+    # PDF linealizado ("fast web view"): objetos de la página 1 primero y tablas de pistas.
+    # Lo hace qpdf (vía pikepdf); pypdf no sabe escribirlo. Devuelve False si no se pudo, y
+    # entonces 'destino' no sirve y se usa 'origen' tal cual.
+    global _sin_pikepdf_avisado
+    if pikepdf is None:
+        if not _sin_pikepdf_avisado:
+            logger.warning("CV_LINEALIZAR está activo pero pikepdf no está instalado")
+            _sin_pikepdf_avisado = True
+        return False
+    origen.seek(0)
+    try:
+        with pikepdf.open(origen) as pdf:
+            # deterministic_id: qpdf recalcula el /ID con un hash del contenido (ver hacer_determinista)
+            pdf.save(destino, linearize=True, deterministic_id=determinista)
+    except Exception as e:
+        logger.warning("No se pudo linealizar el CV: %s", e)
+        return False
+    return True
+
+
+# ==========================================
+# IMÁGENES (al anexar)
+# ==========================================
+def reducir_imagenes(origen, destino, max_dpi, calidad, comprobar=None):
+    # Re-codifica como JPEG (con 'calidad') las imágenes que se dibujan a más de 'max_dpi'.
+    # Devuelve cuántas se redujeron; si ninguna, no escribe nada en 'destino'.
+    # 'comprobar' se llama antes de cada imagen (p. ej. para cortar si se acaba el plazo).
+    writer = PdfWriter(clone_from=PdfReader(origen))
+
+    # Una imagen puede aparecer en varias páginas o varias veces: cuenta el dibujo más grande
+    imagenes = {}
+    for pagina in writer.pages:
+        for nombre, (ancho, alto) in _tamanos_dibujados(pagina).items():
+            ref = pagina['/Resources'].get_object()['/XObject'].get_object().get(nombre)
+            if not isinstance(ref, IndirectObject) or not _reducible(ref.get_object()):
+                continue
+            _, _, ancho_max, alto_max = imagenes.get(ref.idnum, (None, None, 0, 0))
+            imagenes[ref.idnum] = (pagina, nombre, max(ancho, ancho_max), max(alto, alto_max))
+
+    reducidas = 0
+    for pagina, nombre, ancho, alto in imagenes.values():
+        if comprobar: comprobar()
+        xobject = pagina['/Resources'].get_object()['/XObject'].get_object()[nombre].get_object()
+        # Puntos -> pulgadas (72 pt); se usa el eje con menos resolución para no perder nitidez
+        dpi = min(xobject['/Width'] / max(ancho / 72, 1e-3), xobject['/Height'] / max(alto / 72, 1e-3))
+        if dpi <= max_dpi * 1.1:
+            continue
+        imagen = pagina.images[nombre]
+        escala = max_dpi / dpi
+        nueva = imagen.image.convert('L' if imagen.image.mode in ('1', 'L') else 'RGB')
+        nueva = nueva.resize((max(1, round(nueva.width * escala)), max(1, round(nueva.height * escala))), Image.LANCZOS)
+        imagen.replace(nueva, quality=calidad)
+        reducidas += 1
+
+    if reducidas:
+        writer.write(destino)
+    return reducidas
+
+def _reducible(xobject):
+    # Fotos de 8 bits sin transparencia; las máscaras y los escaneos de 1 bit ya son livianos
+    return (xobject.get('/Subtype') == '/Image' and xobject.get('/BitsPerComponent') == 8
+            and not xobject.get('/ImageMask') and '/SMask' not in xobject and '/Mask' not in xobject)
+
+def _tamanos_dibujados(pagina):
+    # {nombre: (ancho, alto)} en puntos con que la página dibuja cada XObject ('Do'), siguiendo
+    # la matriz de transformación (q/Q/cm). Los formularios anidados no se recorren.
+    contenido = pagina.get_contents()
+    if contenido is None or '/Resources' not in pagina:
+        return {}
+    ctm, pila, tamanos = (1, 0, 0, 1, 0, 0), [], {}
+    for operandos, operador in contenido.operations:
+        if operador == b'q':
+            pila.append(ctm)
+        elif operador == b'Q' and pila:
+            ctm = pila.pop()
+        elif operador == b'cm' and len(operandos) == 6:
+            ctm = _multiplicar([float(x) for x in operandos], ctm)
+        elif operador == b'Do' and operandos:
+            ancho, alto = math.hypot(ctm[0], ctm[1]), math.hypot(ctm[2], ctm[3])
+            previo = tamanos.get(operandos[0], (0, 0))
+            tamanos[operandos[0]] = (max(previo[0], ancho), max(previo[1], alto))
+    return tamanos
+
+def _multiplicar(m, n):
+    a, b, c, d, e, f = m
+    return (a * n[0] + b * n[2], a * n[1] + b * n[3],
+            c * n[0] + d * n[2], c * n[1] + d * n[3],
+            e * n[0] + f * n[2] + n[4], e * n[1] + f * n[3] + n[5])
+
+
+# ==========================================
+# TAREAS (hilo de fondo)
+# ==========================================
+def procesar(modelo, pk, nombre):
+    # 'nombre' es el archivo subido: si el registro ya tiene otro (o no existe), no se hace nada
+    clase = apps.get_model('curriculum', modelo)
+    campo = cv_adjuntos.CAMPOS_METADATOS[modelo]
+    registro = clase.objects.filter(pk=pk, **{campo: nombre}).first()
+    if registro is None or not nombre.lower().endswith('.pdf') or registro.adjunto_valido is False:
+        return None
+    original = getattr(registro, campo)
+
+    with tempfile.TemporaryFile() as tmp:
+        with original.storage.open(original.name, 'rb') as origen:
+            optimizar(origen, tmp)
+        antes, despues = registro.adjunto_bytes or original.size, tmp.tell()
+        # Si casi no cambia, el anexo sigue usando el original (un archivo menos en el storage)
+        if despues > antes * (1 - settings.CV_OPTIMIZAR_AHORRO_MINIMO):
+            logger.info("PDF sin mejora al optimizar %s: %d -> %d bytes", nombre, antes, despues)
+            return None
+        tmp.seek(0)
+        registro.adjunto_optimizado.save(os.path.basename(nombre), tmp, save=False)
+
+    # update(): sin señales. Los CVs en caché siguen siendo correctos (mismas páginas), no se invalidan.
+    guardado = registro.adjunto_optimizado.name
+    if not clase.objects.filter(pk=pk, **{campo: nombre}).update(adjunto_optimizado=guardado, adjunto_optimizado_bytes=despues):
+        # Cambiaron el archivo mientras tanto: esta versión ya no corresponde a nada
+        _borrar(guardado)
+        return None
+    logger.info("PDF optimizado %s: %d -> %d bytes", nombre, antes, despues)
+    return antes, despues
+
+def _borrar(nombre):
+    cv_adjuntos.olvidar(nombre)
+    default_storage.delete(nombre)
+
+def encolar(modelo, pk, nombre):
+    if settings.CV_OPTIMIZAR_ADJUNTOS:
+        _poner(functools.partial(procesar, modelo, pk, nombre))
+
+def descartar(nombre):
+    # Versión optimizada que quedó obsoleta (se cambió o borró el original)
+    if nombre:
+        _poner(functools.partial(_borrar, nombre))
+
+def _poner(tarea):
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_procesar_cola, name='cv-optimizar', daemon=True)
+            _worker.start()
+    _cola.put(tarea)
+
+def _procesar_cola():
+    while True:
+        tarea = _cola.get()
+        close_old_connections()
+        try:
+            tarea()
+        except Exception:
+            logger.exception("Error optimizando un PDF adjunto (%s)", tarea.args)
+        finally:
+            close_old_connections()
+            _cola.task_done()
@@ -0,0 +1,358 @@
+# curriculum/cv_platypus.py
+import hashlib
+import logging
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from django.template.defaultfilters import date as formato_fecha
+from django.utils.formats import localize
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_JUSTIFY, TA_RIGHT
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import cm
+from reportlab.lib.utils import ImageReader, open_for_read
+from reportlab.platypus import Image, KeepTogether, PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from . import cv_render
+from .cv_settings import DEFAULT_SETTINGS
+
+logger = logging.getLogger(__name__)
+
+# Motor alternativo a xhtml2pdf (CV_MOTOR_PDF / ?motor=reportlab): arma el mismo diseño de
+# cv_pdf.html directamente con flowables de ReportLab, sin parsear HTML ni CSS.
+# OJO: un cambio visual en la plantilla hay que repetirlo aquí.
+# Se copia lo que xhtml2pdf dibuja de verdad, no todo el CSS: text-transform, letter-spacing y
+# el <div class="divider"> vacío no salen en su PDF, así que aquí tampoco.
+# Las medidas en px de la plantilla se pasan a puntos igual que xhtml2pdf (1px = 0.75pt).
+PX = 0.75
+
+# font_family llega como en el CSS ("Times-Roman, Times New Roman, serif"): vale la primera
+FUENTES = {
+    'Helvetica': ('Helvetica', 'Helvetica-Bold', 'Helvetica-Oblique', 'Helvetica-BoldOblique'),
+    'Times-Roman': ('Times-Roman', 'Times-Bold', 'Times-Italic', 'Times-BoldItalic'),
+    'Courier': ('Courier', 'Courier-Bold', 'Courier-Oblique', 'Courier-BoldOblique'),
+}
+
+# El <td> de la plantilla no tiene padding
+SIN_RELLENO = [
+    ('LEFTPADDING', (0, 0), (-1, -1), 0), ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+    ('TOPPADDING', (0, 0), (-1, -1), 0), ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+]
+
+_version = None
+
+
+# ==========================================
+# UTILIDADES
+# ==========================================
+def version():
+    # Para la caché de secciones: un cambio en este módulo (deploy) no reutiliza secciones viejas
+    global _version
+    if _version is None:
+        with open(__file__, 'rb') as f:
+            _version = hashlib.sha256(f.read()).hexdigest()
+    return _version
+
+def _t(valor):
+    # Como {{ valor }} en la plantilla (fechas y números localizados), escapado para Paragraph
+    return escape(str(localize(valor)))
+
+def _con_saltos(valor):
+    # |linebreaksbr
+    return _t(valor).replace('\r\n', '\n').replace('\n', '<br/>')
+
+def _campo(obj, nombre):
+    # perfil puede ser None (sin DatosPersonales): la plantilla muestra vacío
+    valor = getattr(obj, nombre, '')
+    return '' if valor is None else valor
+
+def _color(valor, defecto):
+    # Los colores del modo personalizado llegan tal cual de la URL
+    return colors.toColor(valor, colors.toColor(defecto))
+
+def _hex(color):
+    return '#' + color.hexval()[2:]
+
+def _tabla(filas, anchos, estilo=(), **kwargs):
+    tabla = Table(filas, colWidths=list(anchos), **kwargs)
+    tabla.setStyle(TableStyle([*SIN_RELLENO, *estilo]))
+    return tabla
+
+
+# ==========================================
+# ESTILOS (los de <style> en cv_pdf.html)
+# ==========================================
+def _estilos(styles):
+    familia = (styles.get('font_family') or '').split(',')[0].strip()
+    normal, negrita, cursiva, negrita_cursiva = FUENTES.get(familia, FUENTES['Helvetica'])
+    e = {
+        'acento': _color(styles.get('accent_color'), DEFAULT_SETTINGS['accent_color']),
+        'linea': _color(styles.get('line_color'), DEFAULT_SETTINGS['line_color']),
+        'cabecera': _color(styles.get('header_color'), DEFAULT_SETTINGS['header_color']),
+    }
+    base = ParagraphStyle('base', fontName=normal, fontSize=11, leading=11 * 1.4, textColor=colors.HexColor('#333333'))
+
+    def estilo(nombre, tamano, fuente=normal, **kwargs):
+        # line-height: 1.4 del body se hereda como proporción
+        kwargs.setdefault('leading', tamano * 1.4)
+        return ParagraphStyle(nombre, parent=base, fontName=fuente, fontSize=tamano, **kwargs)
+
+    e.update({
+        'nombre': estilo('nombre', 32, negrita_cursiva, leading=32,
+                         textColor=_color(styles.get('name_color'), DEFAULT_SETTINGS['name_color'])),
+        'apellido': estilo('apellido', 32, negrita_cursiva, leading=32,
+                           textColor=_color(styles.get('surname_color'), DEFAULT_SETTINGS['surname_color'])),
+        'profesion': estilo('profesion', 14, negrita, textColor=e['acento'], spaceBefore=15 * PX),
+        'etiqueta': estilo('etiqueta', 8, negrita, textColor=e['acento'], spaceAfter=2 * PX),
+        'valor': estilo('valor', 10, negrita, textColor=colors.HexColor('#1a1a1a'), spaceAfter=10 * PX),
+        'bio': estilo('bio', 10, cursiva, textColor=colors.HexColor('#555555')),
+        'seccion': estilo('seccion', 14, negrita_cursiva, textColor=e['cabecera']),
+        'titulo': estilo('titulo', 12, negrita, textColor=colors.HexColor('#1a1a1a')),
+        'subtitulo': estilo('subtitulo', 10, negrita, textColor=e['acento']),
+        'subtitulo_estudio': estilo('subtitulo_estudio', 10, textColor=colors.HexColor('#666666')),
+        'fecha': estilo('fecha', 9, cursiva, textColor=colors.HexColor('#666666'), alignment=TA_RIGHT),
+        'descripcion': estilo('descripcion', 10, textColor=colors.HexColor('#444444'), alignment=TA_JUSTIFY, spaceBefore=5 * PX),
+        'horas': estilo('horas', 8, textColor=e['acento'], alignment=TA_RIGHT),
+        'precio': estilo('precio', 11, negrita, textColor=e['acento'], alignment=TA_RIGHT),
+        'indice_cabecera': estilo('indice_cabecera', 8, negrita, textColor=colors.HexColor('#888888')),
+        'indice_grupo': estilo('indice_grupo', 10, negrita, textColor=colors.HexColor('#1a1a1a')),
+        'indice_item': estilo('indice_item', 10),
+        'indice_estado': estilo('indice_estado', 9, alignment=TA_RIGHT),
+    })
+    e['indice_cabecera_der'] = ParagraphStyle('indice_cabecera_der', parent=e['indice_cabecera'], alignment=TA_RIGHT)
+    return e
+
+def _titulo_seccion(texto, e):
+    # .section-header: título con línea inferior, pegado al primer elemento de la sección
+    tabla = _tabla([[Paragraph(escape(texto), e['seccion'])]], ['100%'], [
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 5 * PX),
+        ('LINEBELOW', (0, 0), (-1, -1), 2 * PX, e['cabecera']),
+    ])
+    tabla.spaceBefore, tabla.spaceAfter = 25 * PX, 15 * PX
+    tabla.keepWithNext = True
+    return tabla
+
+def _item(izquierda, derecha, anchos=('75%', '25%'), descripcion=None, margen=5):
+    # .item-row: título/subtítulo a la izquierda, fecha a la derecha y descripción debajo
+    filas = [[izquierda, derecha]]
+    estilo = []
+    if descripcion is not None:
+        filas.append([descripcion, ''])
+        estilo.append(('SPAN', (0, 1), (1, 1)))
+    tabla = _tabla(filas, anchos, estilo)
+    tabla.spaceAfter = margen * PX
+    return tabla
+
+
+# ==========================================
+# SECCIONES
+# ==========================================
+def _foto(perfil, e):
+    lado = 140 * PX
+    foto = getattr(perfil, 'foto', None)
+    # xhtml2pdf no redondea ni engrosa el borde de <img>: queda una línea fina
+    estilo = [('BOX', (0, 0), (-1, -1), 1 * PX, e['linea'])]
+    if foto:
+        try:
+            # Se lee y se valida aquí: una imagen rota dentro de doc.build() tumbaría todo el render
+            with open_for_read(cv_render.link_callback(foto.url, None)) as f:
+                datos = BytesIO(f.read())
+            ImageReader(datos).getSize()
+            datos.seek(0)
+            imagen = Image(datos, width=lado, height=lado)
+            return _tabla([[imagen]], [lado], estilo, rowHeights=[lado])
+        except Exception as e_foto:
+            # Igual que xhtml2pdf con una imagen rota: el CV sale igual, con el recuadro vacío
+            logger.warning("No se pudo cargar la foto del perfil: %s", e_foto)
+    estilo.append(('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#F0F4F5')))
+    return _tabla([['']], [lado], estilo, rowHeights=[lado])
+
+def _top(ctx, e):
+    perfil, styles = ctx['perfil'], ctx['styles']
+    historia = []
+
+    encabezado = [
+        Paragraph(_t(_campo(perfil, 'nombres')), e['nombre']),
+        Paragraph(_t(_campo(perfil, 'apellidos')), e['apellido']),
+        Paragraph(_t(_campo(perfil, 'profesion') or 'Profesional'), e['profesion']),
+    ]
+    tabla = _tabla([[encabezado, '']], ['75%', '25%'])
+    tabla.spaceAfter = 35 * PX
+    historia.append(tabla)
+
+    def dato(etiqueta, valor):
+        return [Paragraph(escape(etiqueta), e['etiqueta']), Paragraph(_t(valor), e['valor'])]
+    datos = [_tabla([[
+        [*dato('Identificación', _campo(perfil, 'cedula')), *dato('Nacionalidad', _campo(perfil, 'nacionalidad')),
+         *dato('Email', _campo(perfil, 'email'))],
+        [*dato('Teléfono', _campo(perfil, 'telefono')), *dato('Ubicación', _campo(perfil, 'direccion')),
+         *dato('Web', _campo(perfil, 'sitio_web') or '-')],
+    ]], ['50%', '50%'])]
+    if _campo(perfil, 'descripcion_perfil'):
+        bio = _tabla([[Paragraph(f'"{_t(perfil.descripcion_perfil)}"', e['bio'])]], ['100%'], [
+            ('LEFTPADDING', (0, 0), (-1, -1), 10 * PX),
+            ('LINEBEFORE', (0, 0), (-1, -1), 3 * PX, e['acento']),
+        ])
+        datos += [Spacer(1, 15 * PX), bio]
+
+    if styles.get('show_photo'):
+        tabla = _tabla([[_foto(perfil, e), datos]], ['20%', '80%'], [('LEFTPADDING', (1, 0), (1, 0), 25 * PX)])
+    else:
+        tabla = _tabla([[datos]], ['100%'])
+    tabla.spaceAfter = 30 * PX
+    historia.append(tabla)
+
+    if ctx['experiencias']:
+        historia.append(_titulo_seccion('Experiencia Profesional', e))
+        for exp in ctx['experiencias']:
+            # keep-together="always"
+            historia.append(KeepTogether([_item(
+                [Paragraph(_t(exp.cargo), e['titulo']), Paragraph(_t(exp.empresa), e['subtitulo'])],
+                Paragraph(f"{_t(exp.fecha_inicio)} - {_t(exp.fecha_fin)}", e['fecha']),
+                descripcion=Paragraph(_con_saltos(exp.descripcion), e['descripcion']),
+            )]))
+
+    if ctx['estudios']:
+        historia.append(_titulo_seccion('Formación Académica', e))
+        for edu in ctx['estudios']:
+            historia.append(KeepTogether([_item(
+                [Paragraph(_t(edu.titulo), e['titulo']), Paragraph(_t(edu.institucion), e['subtitulo_estudio'])],
+                Paragraph(f"{_t(edu.fecha_inicio)} - {_t(edu.fecha_fin)}", e['fecha']),
+            )]))
+    return historia
+
+def _courses_list(ctx, e):
+    historia = [_titulo_seccion('Formación Continua', e)]
+    for curso in ctx['cursos']:
+        historia.append(_item(
+            [Paragraph(_t(curso.nombre_curso), e['titulo']), Paragraph(_t(curso.institucion), e['subtitulo'])],
+            [Paragraph(escape(formato_fecha(getattr(curso, 'fecha_realizacion', None), 'm/Y')), e['fecha']),
+             Paragraph(f"{_t(curso.horas)} Horas", e['horas'])],
+            margen=8,
+        ))
+    return historia
+
+def _bottom(ctx, e):
+    historia = []
+    if ctx['reconocimientos']:
+        historia.append(_titulo_seccion('Reconocimientos', e))
+        for rec in ctx['reconocimientos']:
+            historia.append(_item(
+                [Paragraph(_t(rec.nombre), e['titulo']), Paragraph(_t(rec.institucion), e['subtitulo'])],
+                Paragraph(escape(formato_fecha(rec.fecha, 'Y')), e['fecha']),
+            ))
+
+    if ctx['academicos']:
+        historia.append(_titulo_seccion('Investigación y Publicaciones', e))
+        for item in ctx['academicos']:
+            historia.append(_item(
+                [Paragraph(_t(item.nombre), e['titulo']), Paragraph(_t(item.clasificador), e['subtitulo'])],
+                '', anchos=('85%', '15%'),
+                descripcion=Paragraph(_t(item.descripcion), e['descripcion']),
+            ))
+
+    if ctx['proyectos']:
+        historia.append(_titulo_seccion('Proyectos', e))
+        for pro in ctx['proyectos']:
+            historia.append(_item(
+                Paragraph(_t(pro.nombre), e['titulo']),
+                Paragraph(escape(formato_fecha(pro.fecha, 'Y')), e['fecha']),
+                descripcion=Paragraph(_con_saltos(pro.descripcion), e['descripcion']),
+            ))
+
+    if ctx['ventas']:
+        historia.append(_titulo_seccion('Catálogo Venta', e))
+        for item in ctx['ventas']:
+            historia.append(_item(
+                [Paragraph(_t(item.nombre_producto), e['titulo']), Paragraph(_t(item.descripcion), e['descripcion'])],
+                Paragraph(f"${_t(item.precio)}", e['precio']),
+                anchos=('70%', '30%'),
+            ))
+    return historia
+
+def _estado_certificado(item, archivo, e):
+    gris = '<font color="#bbbbbb">(%s)</font>'
+    if item.anexo_omitido:
+        return Paragraph(gris % _t(item.anexo_omitido), e['indice_estado'])
+    if not archivo:
+        return Paragraph(gris % 'No disponible', e['indice_estado'])
+    # ReportLab dibuja el ✓ con ZapfDingbats, igual que en xhtml2pdf
+    texto = f'<font color="{_hex(e["acento"])}"><b>✓ Certificado Adjunto</b></font>'
+    if item.anexo_paginas:
+        texto += f'<br/><font color="#999999" size="8">{_t(item.anexo_paginas)}</font>'
+    return Paragraph(texto, e['indice_estado'])
+
+def _certificates_index(ctx, e):
+    filas = [[Paragraph('Detalle / Item', e['indice_cabecera']), Paragraph('Estado del Certificado', e['indice_cabecera_der'])]]
+    estilo = [
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 8 * PX),
+        ('LINEBELOW', (0, 0), (-1, 0), 2 * PX, colors.HexColor('#cccccc')),
+    ]
+
+    def grupo(titulo, espacio):
+        fila = len(filas)
+        filas.append([Paragraph(escape(titulo), e['indice_grupo']), ''])
+        estilo.extend([
+            ('SPAN', (0, fila), (1, fila)),
+            ('TOPPADDING', (0, fila), (-1, fila), espacio * PX),
+            ('BOTTOMPADDING', (0, fila), (-1, fila), 12 * PX),
+        ])
+
+    def item(detalle, registro, archivo):
+        fila = len(filas)
+        filas.append([Paragraph(detalle, e['indice_item']), _estado_certificado(registro, archivo, e)])
+        estilo.extend([
+            # "padding: 6px 0" sale más alto en xhtml2pdf: se copia la altura que dibuja
+            ('TOPPADDING', (0, fila), (-1, fila), 16 * PX),
+            ('BOTTOMPADDING', (0, fila), (-1, fila), 16 * PX),
+            ('VALIGN', (1, fila), (1, fila), 'MIDDLE'),
+            ('LINEBELOW', (0, fila), (-1, fila), 1 * PX, colors.HexColor('#eeeeee'), None, (1, 2)),
+        ])
+
+    if ctx['experiencias']:
+        grupo('Experiencia Laboral', 15)
+        for exp in ctx['experiencias']:
+            item(f'{_t(exp.cargo)} <font color="#666666" size="9">en {_t(exp.empresa)}</font>', exp, exp.certificado)
+    if ctx['cursos']:
+        grupo('Cursos y Capacitaciones', 20)
+        for curso in ctx['cursos']:
+            item(_t(curso.nombre_curso), curso, curso.certificado_pdf)
+    if ctx['reconocimientos']:
+        grupo('Reconocimientos', 20)
+        for rec in ctx['reconocimientos']:
+            item(_t(rec.nombre), rec, rec.certificado_pdf)
+
+    tabla = _tabla(filas, ['65%', '35%'], estilo, repeatRows=1)
+    tabla.spaceBefore = 20 * PX
+    return [_titulo_seccion('Anexo: Documentación de Respaldo', e), tabla]
+
+SECCIONES = {
+    'top': _top,
+    'courses_list': _courses_list,
+    'bottom': _bottom,
+    'certificates_index': _certificates_index,
+}
+
+
+# ==========================================
+# API
+# ==========================================
+def renderizar(ctx, modos):
+    # Mismo contrato que una pasada de xhtml2pdf sobre cv_pdf.html: un PDF con las secciones
+    # de 'modos' en orden, cada una empezando en página nueva
+    e = _estilos(ctx['styles'])
+    historia = []
+    for i, modo in enumerate(modos):
+        if i:
+            historia.append(PageBreak())
+        historia.extend(SECCIONES[modo](ctx, e))
+
+    buf = BytesIO()
+    doc = SimpleDocTemplate(
+        buf, pagesize=A4, leftMargin=1.5 * cm, rightMargin=1.5 * cm, topMargin=1.5 * cm, bottomMargin=1.5 * cm,
+        title=f"CV - {_campo(ctx['perfil'], 'nombres')}", invariant=1,
+    )
+    doc.build(historia)
+    return buf.getvalue()
@@ -0,0 +1,90 @@
+# curriculum/cv_render.py
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from xhtml2pdf import pisa
+
+logger = logging.getLogger(__name__)
+
+
+# ==========================================
+# UTILIDADES
+# ==========================================
+def link_callback(uri, rel):
+    if uri.startswith('http'):
+        return uri
+    sUrl, sRoot = settings.STATIC_URL, settings.STATIC_ROOT
+    mUrl, mRoot = settings.MEDIA_URL, settings.MEDIA_ROOT
+
+    if uri.startswith(mUrl):
+        path = os.path.join(mRoot, uri.replace(mUrl, ""))
+    elif uri.startswith(sUrl):
+        path = os.path.join(sRoot, uri.replace(sUrl, ""))
+    else:
+        path = ""
+
+    if path and os.path.isfile(path):
+        return path
+    if uri.startswith(sUrl):
+        found = finders.find(uri.replace(sUrl, ""))
+        if found: return found
+    return uri
+
+def html_a_pdf(html):
+    # Una pasada de xhtml2pdf: HTML ya renderizado -> bytes del PDF
+    buf = BytesIO()
+    pisa.CreatePDF(html, dest=buf, link_callback=link_callback)
+    return buf.getvalue()
+
+
+# ==========================================
+# POOL DE PROCESOS (opcional)
+# ==========================================
+# xhtml2pdf es CPU puro y el GIL limita un CV a un núcleo. Con CV_RENDER_PROCESOS > 0 las
+# secciones se renderizan en procesos aparte que se mantienen vivos entre peticiones.
+_pool = None
+_pool_lock = threading.Lock()
+
+def _iniciar_worker():
+    # 'spawn' arranca un intérprete limpio: hay que cargar Django (DJANGO_SETTINGS_MODULE viene del entorno)
+    import django
+    django.setup()
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.CV_RENDER_PROCESOS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_iniciar_worker,
+                # Reciclar workers para contener el crecimiento de memoria de xhtml2pdf
+                max_tasks_per_child=settings.CV_RENDER_TAREAS_POR_PROCESO,
+            )
+        return _pool
+
+def _descartar_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def renderizar(htmls):
+    # Devuelve los PDFs en el mismo orden que 'htmls'
+    if settings.CV_RENDER_PROCESOS <= 0 or len(htmls) < 2:
+        return [html_a_pdf(html) for html in htmls]
+    try:
+        return list(get_pool().map(html_a_pdf, htmls))
+    except BrokenProcessPool as e:
+        # Un worker murió (OOM, kill): se descarta el pool y este CV se hace en el proceso actual
+        logger.warning("Pool de render caído, renderizando en proceso: %s", e)
+        _descartar_pool()
+        return [html_a_pdf(html) for html in htmls]
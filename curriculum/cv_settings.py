@@ -1,4 +1,5 @@
 # curriculum/cv_settings.py
+from django.conf import settings
 
 DEFAULT_SETTINGS = {
     'name_color': '#1a1a1a',        # NUEVO: Color solo para Nombres
@@ -10,9 +11,19 @@ DEFAULT_SETTINGS = {
     'show_photo': True,
 }
 
+# Motores de render del PDF: xhtml2pdf (cv_pdf.html) o ReportLab directo (cv_platypus)
+MOTORES = ('xhtml2pdf', 'reportlab')
+
+def get_motor(request):
+    # ?motor=reportlab|xhtml2pdf; si no viene (o no es válido), el de CV_MOTOR_PDF
+    motor = request.GET.get('motor')
+    return motor if motor in MOTORES else settings.CV_MOTOR_PDF
+
 def get_cv_styles(request):
+    # El motor va junto a los estilos: así entra en la clave de caché, en los trabajos
+    # asíncronos y en la caché de secciones sin tocar a nadie más
     if request.GET.get('origen') != 'personalizado':
-        return DEFAULT_SETTINGS
+        return {**DEFAULT_SETTINGS, 'motor': get_motor(request)}
 
     font_map = {
         'helvetica': 'Helvetica, Arial, sans-serif',
@@ -29,5 +40,6 @@ def get_cv_styles(request):
         'accent_color': request.GET.get('accent_color', DEFAULT_SETTINGS['accent_color']),
         'line_color': request.GET.get('line_color', DEFAULT_SETTINGS['line_color']),
         'font_family': font_map.get(selected_font, font_map['helvetica']),
-        'show_photo': request.GET.get('show_photo') == 'on'
+        'show_photo': request.GET.get('show_photo') == 'on',
+        'motor': get_motor(request),
     }
\ No newline at end of file
@@ -0,0 +1,175 @@
+# curriculum/cv_trabajos.py
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import cv_admision, cv_cache, cv_metricas
+
+logger = logging.getLogger(__name__)
+
+# Cola de CVs en segundo plano, guardada en disco (sin broker externo):
+#   CV_CACHE_DIR/trabajos/<id>.json  -> estado del trabajo
+#   CV_CACHE_DIR/trabajos/<id>.pdf   -> resultado cuando está 'listo'
+# El id es la misma clave de la caché de PDFs, así que dos pedidos idénticos comparten trabajo.
+# La cola de cada proceso admite CV_TRABAJOS_MAX_COLA trabajos; con la cola llena se rechaza
+# (ColaLlena -> 503): cualquiera puede inventar claves distintas cambiando los estilos.
+PENDIENTE, PROCESANDO, LISTO, ERROR = 'pendiente', 'procesando', 'listo', 'error'
+
+_ID_VALIDO = re.compile(r'^[0-9a-f]{64}$')
+_cola = None
+_worker = None
+_worker_lock = threading.Lock()
+
+
+class ColaLlena(Exception):
+    pass
+
+
+# ==========================================
+# ARCHIVOS DE ESTADO
+# ==========================================
+def _dir_trabajos():
+    path = os.path.join(settings.CV_CACHE_DIR, 'trabajos')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def _ruta(trabajo_id, ext):
+    if not _ID_VALIDO.match(trabajo_id or ''):
+        raise ValueError(f"Id de trabajo inválido: {trabajo_id!r}")
+    return os.path.join(_dir_trabajos(), f'{trabajo_id}.{ext}')
+
+def ruta_pdf(trabajo_id):
+    return _ruta(trabajo_id, 'pdf')
+
+def leer(trabajo_id):
+    # Un trabajo vencido no existe: se borra al leerlo (estado, descarga y el worker lo ven igual)
+    try:
+        with open(_ruta(trabajo_id, 'json')) as f:
+            trabajo = json.load(f)
+    except (ValueError, FileNotFoundError):
+        return None
+    if _vencido(trabajo, time.time()):
+        _borrar(trabajo['id'])
+        return None
+    return trabajo
+
+def _guardar(trabajo, **cambios):
+    trabajo.update(cambios, actualizado=time.time())
+    cv_cache.escribir_atomico(_ruta(trabajo['id'], 'json'), json.dumps(trabajo).encode())
+    return trabajo
+
+def _borrar(trabajo_id):
+    for ext in ('json', 'pdf'):
+        try: os.remove(_ruta(trabajo_id, ext))
+        except FileNotFoundError: pass
+
+def _vencido(trabajo, ahora):
+    edad = ahora - trabajo['actualizado']
+    if trabajo['estado'] in (LISTO, ERROR):
+        return edad > settings.CV_TRABAJOS_TTL
+    # Pendiente o procesando sin avances: el proceso que lo tomó murió (deploy, OOM, timeout).
+    # Los que esperan en la cola de un proceso vivo se renuevan (_renovar_en_cola)
+    return edad > settings.CV_TRABAJOS_TIMEOUT
+
+def limpiar():
+    # Borra los vencidos de los que nadie volvió a preguntar (leer() los descarta)
+    for nombre in os.listdir(_dir_trabajos()):
+        if nombre.endswith('.json'):
+            leer(nombre[:-5])
+
+
+# ==========================================
+# ENCOLAR
+# ==========================================
+def encolar(clave, filtros, styles, pdf=None):
+    # Devuelve el trabajo (dict). Si ya existe uno vigente para la misma clave, se reutiliza.
+    limpiar()
+    trabajo = leer(clave)
+    if trabajo is not None and trabajo['estado'] != ERROR:
+        return trabajo
+    if trabajo is not None:
+        # Un intento fallido no bloquea los siguientes
+        _borrar(clave)
+
+    trabajo = {'id': clave, 'estado': PENDIENTE, 'filtros': filtros, 'styles': styles,
+               'error': None, 'creado': time.time(), 'actualizado': time.time()}
+    try:
+        # O_EXCL: si otro worker de gunicorn lo creó al mismo tiempo, gana él
+        fd = os.open(_ruta(clave, 'json'), os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+    except FileExistsError:
+        return leer(clave) or trabajo
+    with os.fdopen(fd, 'w') as f:
+        json.dump(trabajo, f)
+
+    if pdf is not None:
+        # Ya estaba en la caché de PDFs: el trabajo nace terminado
+        cv_cache.escribir_atomico(ruta_pdf(clave), pdf)
+        return _guardar(trabajo, estado=LISTO)
+
+    try:
+        _iniciar_worker().put_nowait(clave)
+    except queue.Full:
+        _borrar(clave)
+        raise ColaLlena()
+    return trabajo
+
+
+# ==========================================
+# WORKER LOCAL
+# ==========================================
+def _iniciar_worker():
+    # Devuelve la cola del proceso (se crea con el primer trabajo)
+    global _worker, _cola
+    with _worker_lock:
+        if _cola is None:
+            _cola = queue.Queue(maxsize=settings.CV_TRABAJOS_MAX_COLA)
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_procesar_cola, name='cv-trabajos', daemon=True)
+            _worker.start()
+        return _cola
+
+def _renovar_en_cola():
+    # Cada vez que el worker toma un trabajo, los que siguen esperando en la cola de este proceso
+    # renuevan 'actualizado': esperar turno no es estar muerto, aunque la cola sea larga
+    with _cola.mutex:
+        en_cola = list(_cola.queue)
+    for clave in en_cola:
+        trabajo = leer(clave)
+        if trabajo is not None and trabajo['estado'] == PENDIENTE:
+            _guardar(trabajo)
+
+def _procesar_cola():
+    from .models import DatosPersonales
+    from .views import construir_cv
+
+    while True:
+        clave = _cola.get()
+        _renovar_en_cola()
+        trabajo = leer(clave)
+        if trabajo is None or trabajo['estado'] != PENDIENTE:
+            continue
+        close_old_connections()
+        try:
+            _guardar(trabajo, estado=PROCESANDO)
+            # En segundo plano se espera el cupo sin límite (el trabajo ya está aceptado), pero
+            # sin ocupar todos los cupos si los límites lo permiten (ver cv_admision.cupo_fondo)
+            with cv_metricas.medir() as medicion, cv_admision.cupo_fondo():
+                with cv_metricas.etapa('total'):
+                    with construir_cv(DatosPersonales.objects.first(), trabajo['styles'], trabajo['filtros']) as pdf:
+                        cv_cache.guardar(clave, pdf)
+                        cv_cache.escribir_atomico(ruta_pdf(clave), pdf)
+            _guardar(trabajo, estado=LISTO)
+            if settings.CV_METRICAS:
+                cv_metricas.registrar(medicion, 'trabajo_cv', trabajo=clave)
+        except Exception as e:
+            logger.exception("Error generando CV en segundo plano (%s)", clave)
+            _guardar(trabajo, estado=ERROR, error=str(e))
+        finally:
+            close_old_connections()
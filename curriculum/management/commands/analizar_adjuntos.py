@@ -0,0 +1,64 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from curriculum import cv_adjuntos, cv_cache, cv_optimizar
+
+
+class Command(BaseCommand):
+    help = ("Calcula páginas, tamaño, hash y validez de los archivos adjuntos que todavía no los tienen "
+            "(registros anteriores a los metadatos o archivos cambiados fuera del admin).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--todos', action='store_true',
+                            help="Vuelve a analizar también los archivos que ya tienen metadatos.")
+        parser.add_argument('--optimizar', action='store_true',
+                            help="Genera además la versión optimizada de los PDF válidos que no la tienen "
+                                 "(los que no mejoran se vuelven a intentar en cada corrida).")
+
+    def handle(self, *args, **options):
+        analizados = invalidos = errores = 0
+        for nombre, campo in cv_adjuntos.CAMPOS_METADATOS.items():
+            modelo = apps.get_model('curriculum', nombre)
+            registros = modelo.objects.exclude(**{campo: ''}).exclude(**{f'{campo}__isnull': True})
+            if not options['todos']:
+                registros = registros.filter(adjunto_valido__isnull=True)
+
+            for registro in registros.iterator():
+                archivo = getattr(registro, campo)
+                try:
+                    with archivo.storage.open(archivo.name, 'rb') as f:
+                        metadatos = cv_adjuntos.analizar(f, archivo.name)
+                except Exception as e:
+                    # No se pudo ni leer (red, archivo borrado del storage): queda sin analizar,
+                    # no se marca como dañado por un problema pasajero
+                    errores += 1
+                    self.stdout.write(self.style.ERROR(f"{nombre} #{registro.pk} {archivo.name}: {e}"))
+                    continue
+                # update(): sin señales, así no se vuelve a analizar ni se vacía la caché por cada fila
+                modelo.objects.filter(pk=registro.pk).update(**metadatos)
+                analizados += 1
+                if not metadatos['adjunto_valido']:
+                    invalidos += 1
+                    self.stdout.write(self.style.WARNING(f"{nombre} #{registro.pk} {archivo.name}: archivo dañado"))
+
+            if options['optimizar']:
+                self._optimizar(nombre, modelo, campo)
+
+        # Los PDFs en caché se armaron sin estos datos (p. ej. sin los rangos de páginas del índice)
+        if analizados:
+            cv_cache.invalidar()
+        resumen = f"{analizados} archivo(s) analizado(s), {invalidos} dañado(s), {errores} sin poder leer"
+        self.stdout.write(self.style.ERROR(resumen) if errores else self.style.SUCCESS(resumen))
+
+    def _optimizar(self, nombre, modelo, campo):
+        for pk, archivo in modelo.objects.filter(adjunto_valido=True, adjunto_optimizado='').values_list('pk', campo):
+            if not archivo.lower().endswith('.pdf'):
+                continue
+            try:
+                resultado = cv_optimizar.procesar(nombre, pk, archivo)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"{nombre} #{pk} {archivo}: no se pudo optimizar ({e})"))
+                continue
+            if resultado:
+                antes, despues = resultado
+                self.stdout.write(f"{nombre} #{pk} {archivo}: {antes / 1024:.0f} KB -> {despues / 1024:.0f} KB")
@@ -0,0 +1,252 @@
+import datetime
+import functools
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import threading
+import tracemalloc
+from decimal import Decimal
+from io import BytesIO
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from curriculum import cv_metricas
+from curriculum.cv_settings import DEFAULT_SETTINGS, MOTORES
+from curriculum.models import (
+    DatosPersonales, ExperienciaLaboral, EstudioRealizado,
+    CursoCapacitacion, Reconocimiento, ProductoLaboral, VentaGarage, ProductoAcademico
+)
+
+ETAPAS = ('consultas', 'plantilla', 'pisa', 'platypus', 'adjuntos', 'numeracion', 'optimizacion', 'escritura', 'linealizacion')
+TEXTO = ("Responsable de coordinar equipos multidisciplinarios, documentar procesos y mejorar "
+         "la experiencia de usuario en productos digitales de alto tráfico. ") * 3
+
+
+class AlmacenRemotoSimulado(FileSystemStorage):
+    # Se comporta como Cloudinary: sin ruta local y con URL absoluta (servida por el benchmark)
+    def path(self, name):
+        raise NotImplementedError("Almacenamiento remoto simulado")
+
+
+# ==========================================
+# DATOS SINTÉTICOS
+# ==========================================
+def pdf_sintetico(paginas):
+    # Certificado de prueba con 'paginas' páginas de texto
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    for i in range(paginas):
+        c.setFont('Helvetica-Bold', 28)
+        c.drawCentredString(A4[0] / 2, A4[1] - 200, "CERTIFICADO")
+        c.setFont('Helvetica', 11)
+        for linea in range(30):
+            c.drawString(60, A4[1] - 260 - linea * 16, f"Página {i + 1} - línea {linea + 1} - {TEXTO[:70]}")
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+def generar_datos(n, paginas_adjunto, media_root):
+    # Reemplaza TODO el contenido del CV por n registros de cada modelo.
+    # Se llama dentro de una transacción que después se revierte.
+    for modelo in (DatosPersonales, ExperienciaLaboral, EstudioRealizado, CursoCapacitacion,
+                   Reconocimiento, ProductoLaboral, VentaGarage, ProductoAcademico):
+        modelo.objects.all().delete()
+
+    certificado = pdf_sintetico(paginas_adjunto)
+    def adjunto(carpeta, i):
+        nombre = f'{carpeta}/bench_{i}.pdf'
+        os.makedirs(os.path.join(media_root, carpeta), exist_ok=True)
+        with open(os.path.join(media_root, nombre), 'wb') as f:
+            f.write(certificado)
+        return nombre
+
+    hoy = datetime.date.today()
+    DatosPersonales.objects.create(
+        cedula='0000000000', nombres='Nombre Benchmark', apellidos='Apellido Sintético', sexo='Otro',
+        estado_civil='Soltero/a', telefono='0999999999', email='bench@example.com',
+        direccion='Calle Falsa 123', descripcion_perfil=TEXTO,
+    )
+    ExperienciaLaboral.objects.bulk_create(ExperienciaLaboral(
+        cargo=f'Cargo {i}', empresa=f'Empresa {i}', fecha_inicio=hoy - datetime.timedelta(days=30 * i),
+        descripcion=TEXTO, certificado=adjunto('experiencia', i)) for i in range(n))
+    EstudioRealizado.objects.bulk_create(EstudioRealizado(
+        titulo=f'Título {i}', institucion=f'Universidad {i}', fecha_inicio=hoy) for i in range(n))
+    CursoCapacitacion.objects.bulk_create(CursoCapacitacion(
+        nombre_curso=f'Curso {i}', institucion=f'Instituto {i}', horas=40,
+        certificado_pdf=adjunto('cursos', i)) for i in range(n))
+    Reconocimiento.objects.bulk_create(Reconocimiento(
+        nombre=f'Reconocimiento {i}', institucion=f'Institución {i}',
+        certificado_pdf=adjunto('reconocimientos', i)) for i in range(n))
+    ProductoLaboral.objects.bulk_create(ProductoLaboral(
+        nombre=f'Proyecto {i}', descripcion=TEXTO) for i in range(n))
+    VentaGarage.objects.bulk_create(VentaGarage(
+        nombre_producto=f'Artículo {i}', descripcion=TEXTO[:120], precio=Decimal('10.50'),
+        estado='Nuevo', item_id=f'bench-{i}') for i in range(n))
+    ProductoAcademico.objects.bulk_create(ProductoAcademico(
+        nombre=f'Publicación {i}', clasificador='Artículo', descripcion=TEXTO[:300]) for i in range(n))
+
+
+# ==========================================
+# COMANDO
+# ==========================================
+class Command(BaseCommand):
+    help = ("Benchmark del generador de PDF con datos sintéticos (tiempo, CPU, memoria y tamaño por etapa). "
+            "Los datos se crean dentro de una transacción que se revierte: usar contra una BD de desarrollo.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', default='5,20,50',
+                            help="Registros por modelo, separados por coma (por defecto 5,20,50).")
+        parser.add_argument('--paginas-adjunto', type=int, default=2,
+                            help="Páginas de cada certificado sintético.")
+        parser.add_argument('--repeticiones', type=int, default=3)
+        parser.add_argument('--adjuntos', choices=('local', 'http'), default='local',
+                            help="local: archivos en MEDIA_ROOT; http: servidos por un servidor local que simula Cloudinary.")
+        parser.add_argument('--memoria', action='store_true',
+                            help="Mide el pico de memoria por etapa con tracemalloc (más lento).")
+        parser.add_argument('--con-cache-secciones', action='store_true',
+                            help="Deja activa la caché por sección (por defecto se mide el render completo).")
+        parser.add_argument('--comparar-optimizacion', action='store_true',
+                            help="Cada repetición se genera también sin la pasada final (CV_OPTIMIZAR_SALIDA) "
+                                 "para comparar el tamaño antes/después.")
+        parser.add_argument('--motores',
+                            help="Motores de render a comparar, separados por coma (xhtml2pdf,reportlab). "
+                                 "Por defecto solo CV_MOTOR_PDF.")
+        parser.add_argument('--salida', help="Archivo JSON donde guardar los resultados.")
+
+    def handle(self, *args, **options):
+        from curriculum.views import construir_cv
+
+        tamanos = [int(t) for t in options['tamanos'].split(',') if t.strip()]
+        motores = [m.strip() for m in (options['motores'] or settings.CV_MOTOR_PDF).split(',') if m.strip()]
+        for motor in motores:
+            if motor not in MOTORES:
+                raise CommandError(f"Motor desconocido: {motor} (opciones: {', '.join(MOTORES)})")
+        tmp = tempfile.mkdtemp(prefix='cv-bench-')
+        media_root = os.path.join(tmp, 'media')
+        os.makedirs(media_root)
+
+        # Mismo mecanismo que settings.py (DEFAULT_FILE_STORAGE); location y base_url salen de MEDIA_ROOT/MEDIA_URL
+        servidor = None
+        almacen, media_url = 'django.core.files.storage.FileSystemStorage', settings.MEDIA_URL
+        if options['adjuntos'] == 'http':
+            handler = functools.partial(_SilenciosoHandler, directory=media_root)
+            servidor = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+            threading.Thread(target=servidor.serve_forever, daemon=True).start()
+            almacen, media_url = f'{__name__}.AlmacenRemotoSimulado', f'http://127.0.0.1:{servidor.server_port}/'
+
+        if options['memoria']:
+            tracemalloc.start()
+
+        resultados = []
+        try:
+            with override_settings(DEFAULT_FILE_STORAGE=almacen, MEDIA_ROOT=media_root, MEDIA_URL=media_url,
+                                   CV_CACHE_DIR=os.path.join(tmp, 'cache'),
+                                   CV_CACHE_SECCIONES=options['con_cache_secciones']):
+                for n in tamanos:
+                    with transaction.atomic():
+                        generar_datos(n, options['paginas_adjunto'], media_root)
+                        perfil = DatosPersonales.objects.first()
+                        filtros = {k: True for k in ('experiencia', 'educacion', 'reconocimientos', 'proyectos', 'venta', 'productos_academicos')}
+                        # Los motores se alternan dentro de cada repetición: ninguno se lleva solo
+                        # las primeras corridas (imports, cachés del sistema operativo)
+                        for rep in range(options['repeticiones']):
+                            for motor in motores:
+                                # Cada repetición empieza sin cachés en disco
+                                shutil.rmtree(os.path.join(tmp, 'cache'), ignore_errors=True)
+                                resultado = self._medir(construir_cv, perfil, filtros, motor, n, rep, options['memoria'])
+                                if options['comparar_optimizacion']:
+                                    with override_settings(CV_OPTIMIZAR_SALIDA=False):
+                                        sin = self._medir(construir_cv, perfil, filtros, motor, n, rep, False)
+                                    resultado['datos']['bytes_sin_optimizar'] = sin['datos'].get('bytes_salida', 0)
+                                resultados.append(resultado)
+                        transaction.set_rollback(True)
+        finally:
+            if servidor: servidor.shutdown()
+            if options['memoria']: tracemalloc.stop()
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        informe = {
+            'commit': _commit_actual(),
+            'fecha': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'parametros': {**{k: options[k] for k in ('tamanos', 'paginas_adjunto', 'repeticiones', 'adjuntos', 'memoria',
+                                                      'con_cache_secciones', 'comparar_optimizacion')},
+                           'motores': motores},
+            'resultados': resultados,
+            'resumen': _resumen(resultados),
+        }
+        self._imprimir(informe['resumen'])
+        if options['salida']:
+            with open(options['salida'], 'w') as f:
+                json.dump(informe, f, indent=2)
+            self.stdout.write(f"Resultados guardados en {options['salida']}")
+
+    def _medir(self, construir_cv, perfil, filtros, motor, n, rep, memoria):
+        with cv_metricas.medir(memoria=memoria) as m:
+            with cv_metricas.etapa('total'):
+                construir_cv(perfil, {**DEFAULT_SETTINGS, 'motor': motor}, filtros).close()
+        return {'motor': motor, 'n': n, 'repeticion': rep, 'etapas': m.etapas, 'datos': m.datos}
+
+    def _imprimir(self, resumen):
+        columnas = ('total',) + ETAPAS
+        comparar = any('bytes_sin_optimizar' in fila for fila in resumen)
+        self.stdout.write('motor'.ljust(10) + 'n'.rjust(5) + ''.join(c.rjust(14) for c in columnas) + 'páginas'.rjust(9) + 'KB'.rjust(9)
+                          + ('KB sin opt.'.rjust(13) if comparar else ''))
+        for fila in resumen:
+            linea = (fila['motor'].ljust(10) + str(fila['n']).rjust(5)
+                     + ''.join(f"{fila['wall_ms'].get(c, 0):12.0f}ms" for c in columnas)
+                     + str(fila['paginas']).rjust(9) + f"{fila['bytes_salida'] / 1024:9.0f}")
+            if comparar:
+                linea += f"{fila['bytes_sin_optimizar'] / 1024:13.0f}"
+            self.stdout.write(linea)
+
+        # Con más de un motor: cuánto más rápido es cada uno que xhtml2pdf, por tamaño
+        for fila in resumen:
+            base = next((f for f in resumen if f['n'] == fila['n'] and f['motor'] == 'xhtml2pdf'), None)
+            if base is None or fila is base or not fila['wall_ms'].get('total'):
+                continue
+            self.stdout.write(f"n={fila['n']}: {fila['motor']} {base['wall_ms']['total'] / fila['wall_ms']['total']:.1f}x "
+                              f"más rápido que xhtml2pdf en total "
+                              f"({base['cpu_ms'].get('total', 0):.0f} ms -> {fila['cpu_ms'].get('total', 0):.0f} ms de CPU)")
+
+
+class _SilenciosoHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+def _resumen(resultados):
+    # Mediana por motor y tamaño de cada etapa (wall y CPU)
+    resumen = []
+    for motor, n in dict.fromkeys((r['motor'], r['n']) for r in resultados):
+        corridas = [r for r in resultados if r['motor'] == motor and r['n'] == n]
+        etapas = {e for r in corridas for e in r['etapas']}
+        resumen.append({
+            'motor': motor,
+            'n': n,
+            'wall_ms': {e: statistics.median(r['etapas'].get(e, {}).get('wall_ms', 0) for r in corridas) for e in etapas},
+            'cpu_ms': {e: statistics.median(r['etapas'].get(e, {}).get('cpu_ms', 0) for r in corridas) for e in etapas},
+            'pico_kb': {e: max(r['etapas'].get(e, {}).get('pico_kb', 0) for r in corridas) for e in etapas},
+            'paginas': corridas[-1]['datos'].get('paginas', 0),
+            'bytes_salida': corridas[-1]['datos'].get('bytes_salida', 0),
+        })
+        if 'bytes_sin_optimizar' in corridas[-1]['datos']:
+            resumen[-1]['bytes_sin_optimizar'] = corridas[-1]['datos']['bytes_sin_optimizar']
+    return resumen
+
+def _commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=settings.BASE_DIR, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
@@ -0,0 +1,75 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+
+def calentar(variante, forzar=False):
+    # Se ejecuta en un proceso aparte: renderiza una variante y la deja en la caché de PDFs
+    from curriculum import cv_cache
+    from curriculum.cv_settings import get_cv_styles
+    from curriculum.models import DatosPersonales
+    from curriculum.views import construir_cv, leer_filtros
+
+    inicio = time.perf_counter()
+    request = RequestFactory().get('/generar-cv/?' + variante)
+    styles, filtros = get_cv_styles(request), leer_filtros(request)
+    clave = cv_cache.clave_cv(filtros, styles)
+
+    pdf = None if forzar else cv_cache.abrir(clave)
+    if pdf is not None:
+        with pdf:
+            return variante, 'ya en caché', time.perf_counter() - inicio, os.fstat(pdf.fileno()).st_size
+    with construir_cv(DatosPersonales.objects.first(), styles, filtros) as pdf:
+        estado = 'renderizado' if cv_cache.guardar(clave, pdf) else 'renderizado incompleto (no se guardó)'
+        return variante, estado, time.perf_counter() - inicio, pdf.seek(0, os.SEEK_END)
+
+def _iniciar_proceso():
+    import django
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = "Pre-renderiza el CV por defecto y las variantes de CV_VARIANTES_CALENTAR en la caché de PDFs (tras un deploy o desde cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--variante', action='append', default=[],
+                            help="Query string adicional, p. ej. 'origen=personalizado&experiencia=on'. Se puede repetir.")
+        parser.add_argument('--paralelo', type=int, default=2,
+                            help="Renders simultáneos (procesos). 1 = todo en este proceso.")
+        parser.add_argument('--forzar', action='store_true',
+                            help="Vuelve a renderizar aunque la variante ya esté en caché.")
+
+    def handle(self, *args, **options):
+        # El CV por defecto siempre va primero; se quitan duplicados conservando el orden
+        variantes = list(dict.fromkeys(['', *settings.CV_VARIANTES_CALENTAR, *options['variante']]))
+        forzar = options['forzar']
+        inicio = time.perf_counter()
+
+        if options['paralelo'] <= 1:
+            resultados = (self._seguro(v, calentar, v, forzar) for v in variantes)
+            self._reportar(resultados)
+        else:
+            with ProcessPoolExecutor(max_workers=min(options['paralelo'], len(variantes)),
+                                     mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=_iniciar_proceso) as pool:
+                futuros = [(v, pool.submit(calentar, v, forzar)) for v in variantes]
+                self._reportar(self._seguro(v, f.result) for v, f in futuros)
+
+        self.stdout.write(f"Total: {time.perf_counter() - inicio:.2f}s para {len(variantes)} variante(s)")
+
+    def _seguro(self, variante, funcion, *args):
+        # Un fallo en una variante no debe tumbar build.sh (set -o errexit)
+        try:
+            return funcion(*args)
+        except Exception as e:
+            return variante, f'ERROR: {e}', 0.0, 0
+
+    def _reportar(self, resultados):
+        for variante, estado, segundos, size in resultados:
+            linea = f"{variante or '(por defecto)'}: {estado} en {segundos:.2f}s ({size / 1024:.0f} KB)"
+            self.stdout.write(self.style.ERROR(linea) if estado.startswith('ERROR') else self.style.SUCCESS(linea))
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.1 on 2026-10-18 11:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('curriculum', '0028_productoacademico'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FalloAdjunto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=255, unique=True, verbose_name='Archivo en el storage')),
+                ('url', models.CharField(blank=True, max_length=500)),
+                ('modelo', models.CharField(blank=True, help_text='Registro dueño del certificado', max_length=100)),
+                ('objeto_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('fallos', models.PositiveIntegerField(default=0, verbose_name='Fallos seguidos')),
+                ('ultimo_error', models.TextField(blank=True, verbose_name='Último error')),
+                ('primer_fallo', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ultimo_fallo', models.DateTimeField(default=django.utils.timezone.now)),
+                ('bloqueado_hasta', models.DateTimeField(blank=True, help_text='Hasta esta hora el CV no intenta leerlo', null=True)),
+            ],
+            options={
+                'verbose_name': 'Fallo de certificado',
+                'verbose_name_plural': 'Fallos de certificados (CV PDF)',
+                'ordering': ['-ultimo_fallo'],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.0.1 on 2026-10-18 11:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('curriculum', '0030_metadatos_adjuntos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cursocapacitacion',
+            name='adjunto_optimizado',
+            field=models.FileField(blank=True, editable=False, max_length=255, upload_to='optimizados/'),
+        ),
+        migrations.AddField(
+            model_name='cursocapacitacion',
+            name='adjunto_optimizado_bytes',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='estudiorealizado',
+            name='adjunto_optimizado',
+            field=models.FileField(blank=True, editable=False, max_length=255, upload_to='optimizados/'),
+        ),
+        migrations.AddField(
+            model_name='estudiorealizado',
+            name='adjunto_optimizado_bytes',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='experiencialaboral',
+            name='adjunto_optimizado',
+            field=models.FileField(blank=True, editable=False, max_length=255, upload_to='optimizados/'),
+        ),
+        migrations.AddField(
+            model_name='experiencialaboral',
+            name='adjunto_optimizado_bytes',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='reconocimiento',
+            name='adjunto_optimizado',
+            field=models.FileField(blank=True, editable=False, max_length=255, upload_to='optimizados/'),
+        ),
+        migrations.AddField(
+            model_name='reconocimiento',
+            name='adjunto_optimizado_bytes',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
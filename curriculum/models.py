@@ -4,6 +4,36 @@ from django.utils import timezone
 import cloudinary.utils
 from django.core.validators import FileExtensionValidator
 
+# ============================================== #
+# 0. METADATOS DEL ARCHIVO ADJUNTO (abstracto)   #
+# ============================================== #
+class MetadatosAdjunto(models.Model):
+    # Se calculan al subir el archivo (signals.py) o con 'manage.py analizar_adjuntos'.
+    # Con ellos el CV en PDF planifica el anexo sin descargar ni abrir el archivo.
+    # None = todavía no se analizó.
+    adjunto_paginas = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    adjunto_bytes = models.PositiveBigIntegerField(null=True, blank=True, editable=False)
+    adjunto_sha256 = models.CharField(max_length=64, blank=True, default="", editable=False)
+    adjunto_valido = models.BooleanField(null=True, editable=False)
+    # Versión comprimida del PDF (cv_optimizar), guardada junto al original; vacía si no ahorraba nada
+    adjunto_optimizado = models.FileField(upload_to='optimizados/', max_length=255, blank=True, editable=False)
+    adjunto_optimizado_bytes = models.PositiveBigIntegerField(null=True, blank=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def resumen_adjunto(self):
+        if self.adjunto_valido is None:
+            return "Sin analizar"
+        if not self.adjunto_valido:
+            return "Archivo dañado o ilegible"
+        resumen = f"{self.adjunto_paginas} página(s) · {self.adjunto_bytes / 1024:.0f} KB"
+        if self.adjunto_optimizado:
+            resumen += f" (optimizado: {self.adjunto_optimizado_bytes / 1024:.0f} KB)"
+        return resumen
+    resumen_adjunto.short_description = "Archivo analizado"
+
+
 # ============================================== #
 # 1. DATOS PERSONALES (Con lógica de privacidad) #
 # ============================================== #
@@ -75,7 +105,7 @@ class DatosPersonales(models.Model):
 # ========================================= #
 # 2. EXPERIENCIA (Con validación de fechas) #
 # ========================================= #
-class ExperienciaLaboral(models.Model):
+class ExperienciaLaboral(MetadatosAdjunto):
     cargo = models.CharField(max_length=150, default="Cargo no especificado")
     empresa = models.CharField(max_length=150, default="Empresa no especificada")
     # ADAPTACIÓN: Cambiado a DateField para validación lógica
@@ -133,7 +163,7 @@ class ExperienciaLaboral(models.Model):
 # ================================== #
 # 3. ESTUDIOS (Con lógica de fechas) #
 # ================================== #
-class EstudioRealizado(models.Model):
+class EstudioRealizado(MetadatosAdjunto):
     titulo = models.CharField(max_length=200)
     institucion = models.CharField(max_length=200)
     descripcion = models.TextField(null=True, blank=True, verbose_name="Descripción / Logros")
@@ -175,7 +205,7 @@ class EstudioRealizado(models.Model):
 # 4. CURSOS (Simplificado pero ordenado) #
 # ====================================== #
 
-class CursoCapacitacion(models.Model):
+class CursoCapacitacion(MetadatosAdjunto):
     nombre_curso = models.CharField(max_length=200)
     institucion = models.CharField(max_length=200)
     horas = models.PositiveIntegerField(help_text="Cantidad de horas académicas") # Cambiado a número para poder sumar totales si quisieras
@@ -235,7 +265,7 @@ class CursoCapacitacion(models.Model):
 # ================== #
 # 5. RECONOCIMIENTOS #
 # ================== #
-class Reconocimiento(models.Model):
+class Reconocimiento(MetadatosAdjunto):
     nombre = models.CharField(max_length=200, default="Reconocimiento no especificado")
     institucion = models.CharField(max_length=200, default="Institución no especificada")
     fecha = models.DateField(default=timezone.now) 
@@ -378,4 +408,28 @@ class ProductoAcademico(models.Model):
         verbose_name_plural = "Productos Académicos"
 
     def __str__(self):
-        return self.nombre
\ No newline at end of file
+        return self.nombre
+
+# ================================================ #
+# 9. FALLOS DE CERTIFICADOS (circuito del CV PDF)  #
+# ================================================ #
+class FalloAdjunto(models.Model):
+    # Lo llena el generador del CV (cv_circuito.py): un certificado que falla varias veces
+    # seguidas se salta durante un tiempo en lugar de esperar su timeout en cada render.
+    nombre = models.CharField(max_length=255, unique=True, verbose_name="Archivo en el storage")
+    url = models.CharField(max_length=500, blank=True)
+    modelo = models.CharField(max_length=100, blank=True, help_text="Registro dueño del certificado")
+    objeto_id = models.PositiveBigIntegerField(null=True, blank=True)
+    fallos = models.PositiveIntegerField(default=0, verbose_name="Fallos seguidos")
+    ultimo_error = models.TextField(blank=True, verbose_name="Último error")
+    primer_fallo = models.DateTimeField(default=timezone.now)
+    ultimo_fallo = models.DateTimeField(default=timezone.now)
+    bloqueado_hasta = models.DateTimeField(null=True, blank=True, help_text="Hasta esta hora el CV no intenta leerlo")
+
+    class Meta:
+        verbose_name = "Fallo de certificado"
+        verbose_name_plural = "Fallos de certificados (CV PDF)"
+        ordering = ['-ultimo_fallo']
+
+    def __str__(self):
+        return f"{self.nombre} ({self.fallos} fallos)"
@@ -0,0 +1,66 @@
+# curriculum/signals.py
+import functools
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+
+from . import cv_cache, cv_adjuntos, cv_optimizar
+
+
+def refrescar_adjunto(sender, instance, **kwargs):
+    # Si el admin sube otro certificado (o lo quita), la copia local del anterior ya no sirve
+    # y los metadatos (páginas, tamaño, hash, validez) se vuelven a calcular
+    campo = cv_adjuntos.CAMPOS_METADATOS[sender.__name__]
+    nuevo = getattr(instance, campo)
+    anterior, huella, optimizado, optimizado_bytes = (
+        sender.objects.filter(pk=instance.pk).values_list(campo, 'adjunto_sha256', 'adjunto_optimizado', 'adjunto_optimizado_bytes').first()
+        if instance.pk else None
+    ) or (None, '', '', None)
+    if anterior and anterior != nuevo.name:
+        cv_adjuntos.olvidar(anterior, huella)
+
+    if nuevo and not nuevo._committed:
+        cv_adjuntos.olvidar(nuevo.name)
+        # Todavía es el archivo subido (memoria o temporal): se analiza antes de mandarlo al storage
+        metadatos = {**cv_adjuntos.METADATOS_VACIOS, **cv_adjuntos.analizar(nuevo.file, nuevo.name)}
+        # Ya en el storage y con el commit hecho, se optimiza en segundo plano (post_save)
+        instance._optimizar_adjunto = metadatos['adjunto_valido'] and nuevo.name.lower().endswith('.pdf')
+    elif not nuevo or anterior != nuevo.name:
+        # Sin archivo, u otro ya guardado: los metadatos viejos no sirven ('analizar_adjuntos' los recalcula)
+        metadatos = cv_adjuntos.METADATOS_VACIOS
+    else:
+        # Mismo archivo: se conserva la versión optimizada aunque el hilo la haya guardado
+        # después de que se cargara esta instancia
+        metadatos = {'adjunto_optimizado': optimizado, 'adjunto_optimizado_bytes': optimizado_bytes}
+    if optimizado and metadatos['adjunto_optimizado'] != optimizado:
+        transaction.on_commit(functools.partial(cv_optimizar.descartar, optimizado))
+    for atributo, valor in metadatos.items():
+        setattr(instance, atributo, valor)
+
+def optimizar_adjunto(sender, instance, **kwargs):
+    if getattr(instance, '_optimizar_adjunto', False):
+        instance._optimizar_adjunto = False
+        nombre = getattr(instance, cv_adjuntos.CAMPOS_METADATOS[sender.__name__]).name
+        transaction.on_commit(functools.partial(cv_optimizar.encolar, sender.__name__, instance.pk, nombre))
+
+def olvidar_adjunto(sender, instance, **kwargs):
+    archivo = getattr(instance, cv_adjuntos.CAMPOS_METADATOS[sender.__name__])
+    if archivo: cv_adjuntos.olvidar(archivo.name, instance.adjunto_sha256)
+    if instance.adjunto_optimizado:
+        transaction.on_commit(functools.partial(cv_optimizar.descartar, instance.adjunto_optimizado.name))
+
+
+def conectar():
+    # Cualquier cambio en los datos del CV invalida los PDFs ya generados
+    for nombre in cv_cache.MODELOS_CV:
+        modelo = apps.get_model('curriculum', nombre)
+        post_save.connect(cv_cache.invalidar, sender=modelo, dispatch_uid=f'cv_cache_save_{nombre}')
+        post_delete.connect(cv_cache.invalidar, sender=modelo, dispatch_uid=f'cv_cache_delete_{nombre}')
+
+    # Archivos adjuntos: mantener al día la copia local y los metadatos de cada archivo
+    for nombre in cv_adjuntos.CAMPOS_METADATOS:
+        modelo = apps.get_model('curriculum', nombre)
+        pre_save.connect(refrescar_adjunto, sender=modelo, dispatch_uid=f'cv_adjuntos_save_{nombre}')
+        post_save.connect(optimizar_adjunto, sender=modelo, dispatch_uid=f'cv_adjuntos_optimizar_{nombre}')
+        post_delete.connect(olvidar_adjunto, sender=modelo, dispatch_uid=f'cv_adjuntos_delete_{nombre}')
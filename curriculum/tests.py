@@ -1,3 +1,178 @@
-from django.test import TestCase
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from django.test import RequestFactory, SimpleTestCase
+from django.utils.http import http_date
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+from reportlab.pdfgen import canvas
+
+from . import views
+from .views import RangoInsatisfacible, _if_range_vigente, _rango, numerar_paginas, respuesta_pdf
+
+
+class RangoTests(SimpleTestCase):
+    # Cabecera "Range: bytes=a-b" sobre un archivo de 100 bytes
+
+    def test_rango_cerrado(self):
+        self.assertEqual(_rango('bytes=0-9', 100), (0, 9))
+        self.assertEqual(_rango(' bytes=10-10 ', 100), (10, 10))
+
+    def test_fin_mas_alla_del_archivo_se_recorta(self):
+        self.assertEqual(_rango('bytes=90-500', 100), (90, 99))
+
+    def test_rango_abierto(self):
+        self.assertEqual(_rango('bytes=40-', 100), (40, 99))
+
+    def test_sufijo(self):
+        self.assertEqual(_rango('bytes=-10', 100), (90, 99))
+        self.assertEqual(_rango('bytes=-500', 100), (0, 99))
+
+    def test_inicio_mayor_que_fin_se_ignora(self):
+        self.assertIsNone(_rango('bytes=10-5', 100))
+
+    def test_cabeceras_que_se_ignoran(self):
+        for cabecera in (None, '', 'bytes=-', 'bytes=0-1,5-6', 'items=0-1', 'bytes=a-b'):
+            self.assertIsNone(_rango(cabecera, 100), cabecera)
+
+    def test_fuera_del_archivo(self):
+        for cabecera in ('bytes=100-', 'bytes=100-200', 'bytes=-0'):
+            with self.assertRaises(RangoInsatisfacible):
+                _rango(cabecera, 100)
+
+
+class IfRangeTests(SimpleTestCase):
+
+    def test_etag(self):
+        self.assertTrue(_if_range_vigente('"abc"', '"abc"', 1000))
+        self.assertFalse(_if_range_vigente('"otro"', '"abc"', 1000))
+        # Comparación fuerte: un ETag débil nunca coincide
+        self.assertFalse(_if_range_vigente('W/"abc"', '"abc"', 1000))
+        self.assertFalse(_if_range_vigente('"abc"', None, 1000))
+
+    def test_fecha(self):
+        self.assertTrue(_if_range_vigente(http_date(1000), '"abc"', 1000))
+        self.assertFalse(_if_range_vigente(http_date(999), '"abc"', 1000))
+        self.assertFalse(_if_range_vigente(http_date(1000), '"abc"', None))
+        self.assertFalse(_if_range_vigente('no es una fecha', '"abc"', 1000))
+
+
+class RespuestaPdfTests(SimpleTestCase):
+    contenido = bytes(range(100))
+
+    def responder(self, **cabeceras):
+        request = RequestFactory().get('/', headers=cabeceras)
+        return respuesta_pdf(request, BytesIO(self.contenido), 'cv.pdf', '"abc"', 1000)
+
+    def cuerpo(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_sin_rango(self):
+        response = self.responder()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.cuerpo(response), self.contenido)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_rango(self):
+        response = self.responder(Range='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(self.cuerpo(response), self.contenido[10:20])
+
+    def test_rango_invertido_da_el_archivo_entero(self):
+        response = self.responder(Range='bytes=10-5')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.cuerpo(response), self.contenido)
+
+    def test_rango_insatisfacible(self):
+        response = self.responder(Range='bytes=200-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+
+    def test_if_range_vigente(self):
+        response = self.responder(Range='bytes=10-19', If_Range='"abc"')
+        self.assertEqual(response.status_code, 206)
+
+    def test_if_range_de_otra_version(self):
+        for valor in ('"viejo"', http_date(500)):
+            response = self.responder(Range='bytes=10-19', If_Range=valor)
+            self.assertEqual(response.status_code, 200, valor)
+            self.assertEqual(self.cuerpo(response), self.contenido)
+        # Con otra versión tampoco aplica el 416: se manda el archivo nuevo
+        self.assertEqual(self.responder(Range='bytes=200-', If_Range='"viejo"').status_code, 200)
+
+
+class NumerarPaginasTests(SimpleTestCase):
+
+    def writer(self, paginas=3):
+        # PDF de ReportLab con texto en cada página (cada una con su /Contents y /Resources)
+        buffer = BytesIO()
+        c = canvas.Canvas(buffer)
+        for i in range(paginas):
+            c.drawString(100, 700, f"Contenido {i + 1}")
+            c.showPage()
+        c.save()
+        writer = PdfWriter()
+        for page in PdfReader(buffer).pages:
+            writer.add_page(page)
+        return writer
+
+    def estado(self, writer):
+        # Lo que numerar_paginas toca en cada página
+        estado = []
+        for page in writer.pages:
+            contenido = page.raw_get('/Contents') if '/Contents' in page else None
+            recursos = page['/Resources'].get_object() if '/Resources' in page else None
+            fuentes = recursos['/Font'].get_object() if recursos is not None and '/Font' in recursos else None
+            estado.append((contenido, recursos is None, None if fuentes is None else dict(fuentes)))
+        return estado
+
+    def texto(self, writer):
+        buffer = BytesIO()
+        writer.write(buffer)
+        return [page.extract_text() for page in PdfReader(buffer).pages]
+
+    def falla_en(self, n):
+        # Un DecodedStreamObject cuyo set_data falla en la llamada 'n' (la 1 es el "q" de apertura)
+        llamadas = []
+
+        class Roto(DecodedStreamObject):
+            def set_data(self, data):
+                llamadas.append(data)
+                if len(llamadas) == n:
+                    raise RuntimeError("falla inyectada")
+                super().set_data(data)
+        return mock.patch.object(views, 'DecodedStreamObject', Roto)
+
+    def test_numera_cada_pagina(self):
+        writer = numerar_paginas(self.writer(3))
+        textos = self.texto(writer)
+        for i, texto in enumerate(textos):
+            self.assertIn(f"Contenido {i + 1}", texto)
+            self.assertIn(f"Página {i + 1} de 3", texto)
+
+    def test_fallo_a_mitad_deja_el_writer_como_estaba(self):
+        writer = self.writer(3)
+        antes = self.estado(writer)
+        # 3 = sello de la segunda página: la primera ya quedó estampada
+        with self.falla_en(3), self.assertRaises(RuntimeError):
+            numerar_paginas(writer)
+        self.assertEqual(self.estado(writer), antes)
+        self.assertTrue(all("Página" not in texto for texto in self.texto(writer)))
+
+    def test_fallo_con_recursos_compartidos(self):
+        # Páginas en blanco que comparten el diccionario de recursos, una ya con /FNumPag
+        writer = PdfWriter()
+        for _ in range(3):
+            writer.add_blank_page(200, 200)
+        previa = DictionaryObject({NameObject('/Type'): NameObject('/Font')})
+        fuentes = DictionaryObject({NameObject('/FNumPag'): writer._add_object(previa)})
+        recursos = writer._add_object(DictionaryObject({NameObject('/Font'): fuentes}))
+        for page in writer.pages[:2]:
+            page[NameObject('/Resources')] = recursos
+        antes = self.estado(writer)
+        for n in (2, 3, 4):
+            with self.subTest(falla_en=n), self.falla_en(n), self.assertRaises(RuntimeError):
+                numerar_paginas(writer)
+            self.assertEqual(self.estado(writer), antes)
+        self.assertIs(fuentes['/FNumPag'].get_object(), previa)
@@ -13,5 +13,8 @@ urlpatterns = [
     path('contacto/', views.contacto, name='contacto'),
     # Esta es la ruta que faltaba y causaba el error
     path('generar-cv/', views.generar_cv, name='generar_cv'),
+    # Modo asíncrono (?modo=asincrono): consultar estado y descargar el resultado
+    path('generar-cv/trabajos/<str:trabajo_id>/', views.estado_cv, name='estado_cv'),
+    path('generar-cv/trabajos/<str:trabajo_id>/pdf/', views.descargar_cv, name='descargar_cv'),
     path('productos-academicos/', views.productos_academicos, name='productos_academicos'),
 ]
\ No newline at end of file
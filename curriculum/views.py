@@ -1,66 +1,142 @@
+import datetime
+import hashlib
+import logging
 import os
-import requests
+import re
+import tempfile
 from io import BytesIO
 from django.conf import settings
 from django.shortcuts import render
-from django.http import HttpResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
 from django.template.loader import get_template
-from xhtml2pdf import pisa
-from django.contrib.staticfiles import finders
 from .models import (
     DatosPersonales, ExperienciaLaboral, EstudioRealizado, 
     CursoCapacitacion, Reconocimiento, ProductoLaboral, VentaGarage, ProductoAcademico
 )
 from pypdf import PdfWriter, PdfReader
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
+from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, NameObject
+from reportlab.pdfbase import pdfmetrics
 from reportlab.lib.units import mm
 
 # AHORA SÍ FUNCIONARÁ ESTA IMPORTACIÓN
 from .cv_settings import get_cv_styles
+from . import cv_admision, cv_cache, cv_adjuntos, cv_metricas, cv_optimizar, cv_platypus, cv_render, cv_trabajos
+
+logger = logging.getLogger(__name__)
 
 # ==========================================
 # UTILIDADES
 # ==========================================
-def link_callback(uri, rel):
-    if uri.startswith('http'):
-        return uri
-    sUrl, sRoot = settings.STATIC_URL, settings.STATIC_ROOT
-    mUrl, mRoot = settings.MEDIA_URL, settings.MEDIA_ROOT
-    
-    if uri.startswith(mUrl):
-        path = os.path.join(mRoot, uri.replace(mUrl, ""))
-    elif uri.startswith(sUrl):
-        path = os.path.join(sRoot, uri.replace(sUrl, ""))
+_RANGO = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangoInsatisfacible(Exception):
+    pass
+
+def _rango(cabecera, total):
+    # Interpreta "Range: bytes=a-b" para un archivo de 'total' bytes. Devuelve (inicio, fin)
+    # inclusivos, o None si hay que ignorar la cabecera y mandar el archivo entero (cabecera
+    # mal formada, varios rangos o a > b). Un rango válido que cae fuera del archivo lanza
+    # RangoInsatisfacible (416).
+    rango = _RANGO.match((cabecera or '').strip())
+    if not rango or not (rango.group(1) or rango.group(2)):
+        return None
+    if rango.group(1):
+        inicio = int(rango.group(1))
+        if rango.group(2):
+            if int(rango.group(2)) < inicio:
+                return None
+            fin = min(int(rango.group(2)), total - 1)
+        else:
+            fin = total - 1
     else:
-        path = ""
+        # "bytes=-N": los últimos N bytes
+        inicio, fin = max(0, total - int(rango.group(2))), total - 1
+    if inicio > fin:
+        raise RangoInsatisfacible()
+    return inicio, fin
+
+def _if_range_vigente(valor, etag, modificado):
+    # If-Range: el rango solo vale si el cliente tiene esta misma versión; si no, archivo entero.
+    # Se compara con el ETag (comparación fuerte: los W/ nunca coinciden) o con la fecha exacta.
+    valor = valor.strip()
+    if valor.startswith('"') or valor.startswith('W/'):
+        return etag is not None and valor == etag
+    fecha = parse_http_date_safe(valor)
+    return fecha is not None and modificado is not None and fecha == int(modificado)
 
-    if path and os.path.isfile(path):
-        return path
-    if uri.startswith(sUrl):
-        found = finders.find(uri.replace(sUrl, ""))
-        if found: return found
-    return uri
+def _literal_pdf(texto):
+    # Helvetica estándar con WinAnsiEncoding: 'á' y compañía van como bytes cp1252
+    data = texto.encode('cp1252', 'replace')
+    return b'(' + data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
 
 def numerar_paginas(pdf_writer):
-    temp_buffer = BytesIO()
-    pdf_writer.write(temp_buffer)
-    temp_buffer.seek(0)
-    reader = PdfReader(temp_buffer)
-    total_pages = len(reader.pages)
-    final_writer = PdfWriter()
-
-    for i, page in enumerate(reader.pages):
-        packet = BytesIO()
-        can = canvas.Canvas(packet, pagesize=A4)
-        can.setFillColorRGB(0.5, 0.5, 0.5) 
-        can.setFont("Helvetica", 9)
-        can.drawCentredString(A4[0]/2, 15*mm, f"Página {i+1} de {total_pages}")
-        can.save()
-        packet.seek(0)
-        page.merge_page(PdfReader(packet).pages[0])
-        final_writer.add_page(page)
-    return final_writer
+    # Estampa "Página i de N" directamente sobre las páginas del writer: sin volcar el PDF
+    # a memoria para releerlo y sin un canvas de ReportLab por página.
+    # Todas las páginas comparten la misma fuente y el mismo stream de apertura ("q").
+    # Todo o nada: primero se prepara cada página sin tocar el writer y, si algo falla al
+    # aplicarlo, se deshace lo aplicado; quien llama puede seguir con el writer sin numerar.
+    total_pages = len(pdf_writer.pages)
+    preparadas = []
+    for i, page in enumerate(pdf_writer.pages):
+        texto = f"Página {i+1} de {total_pages}"
+        box = page.mediabox
+        x = float(box.left) + (float(box.width) - pdfmetrics.stringWidth(texto, 'Helvetica', 9)) / 2
+        y = float(box.bottom) + 15*mm
+        # El contenido original queda entre q/Q para que su estado gráfico no afecte al número
+        sello = b'\nQ q 0.5 0.5 0.5 rg BT /FNumPag 9 Tf %.2f %.2f Td %s Tj ET Q\n' % (x, y, _literal_pdf(texto))
+
+        contenido = page.raw_get('/Contents') if '/Contents' in page else None
+        if contenido is None: actuales = []
+        elif isinstance(contenido.get_object(), ArrayObject): actuales = list(contenido.get_object())
+        else: actuales = [contenido]
+        preparadas.append((page, contenido, actuales, sello))
+
+    fuente = pdf_writer._add_object(DictionaryObject({
+        NameObject('/Type'): NameObject('/Font'),
+        NameObject('/Subtype'): NameObject('/Type1'),
+        NameObject('/BaseFont'): NameObject('/Helvetica'),
+        NameObject('/Encoding'): NameObject('/WinAnsiEncoding'),
+    }))
+    abrir = DecodedStreamObject()
+    abrir.set_data(b'q\n')
+    abrir = pdf_writer._add_object(abrir)
+
+    aplicadas = []
+    try:
+        for page, contenido, actuales, datos in preparadas:
+            # Estado de la página ANTES de tocarla, para deshacer: /Contents, /Resources, /Font y /FNumPag
+            recursos = page['/Resources'].get_object() if '/Resources' in page else None
+            fuentes = recursos['/Font'].get_object() if recursos is not None and '/Font' in recursos else None
+            aplicadas.append((page, contenido, recursos, fuentes, fuentes.get('/FNumPag') if fuentes is not None else None))
+
+            sello = DecodedStreamObject()
+            sello.set_data(datos)
+            page[NameObject('/Contents')] = ArrayObject([abrir, *actuales, pdf_writer._add_object(sello)])
+            if recursos is None:
+                recursos = page[NameObject('/Resources')] = DictionaryObject()
+            if fuentes is None:
+                fuentes = recursos[NameObject('/Font')] = DictionaryObject()
+            fuentes[NameObject('/FNumPag')] = fuente
+    except Exception:
+        # Al revés: varias páginas pueden compartir el mismo diccionario de recursos.
+        # Los objetos ya agregados quedan huérfanos (con CV_OPTIMIZAR_SALIDA la pasada final los descarta)
+        for page, contenido, recursos, fuentes, previa in reversed(aplicadas):
+            if contenido is None: page.pop(NameObject('/Contents'), None)
+            else: page[NameObject('/Contents')] = contenido
+            if recursos is None:
+                page.pop(NameObject('/Resources'), None)
+            elif fuentes is None:
+                recursos.pop(NameObject('/Font'), None)
+            elif previa is None:
+                fuentes.pop(NameObject('/FNumPag'), None)
+            else:
+                fuentes[NameObject('/FNumPag')] = previa
+        raise
+    return pdf_writer
 
 # ==========================================
 # VISTAS HTML
@@ -92,110 +168,398 @@ def productos_academicos(request):
 # ==========================================
 # GENERADOR PDF
 # ==========================================
-def generar_cv(request):
-    perfil = DatosPersonales.objects.first()
-    styles = get_cv_styles(request)
-
+def leer_filtros(request):
     # 1. CAPTURAR FILTROS (Aquí estaba el fallo, faltaban varios)
     origen = request.GET.get('origen')
     is_custom = (origen == 'personalizado') # Variable auxiliar para limpieza
 
     # Si es personalizado, leemos el checkbox. Si no, asumimos True (mostrar todo).
-    incluir_exp = request.GET.get('experiencia') == 'on' if is_custom else True
-    incluir_edu = request.GET.get('educacion') == 'on' if is_custom else True
-    
-    # --- NUEVOS FILTROS CORREGIDOS ---
-    incluir_rec = request.GET.get('reconocimientos') == 'on' if is_custom else True
-    incluir_pro = request.GET.get('proyectos') == 'on' if is_custom else True
-    incluir_ven = request.GET.get('venta') == 'on' if is_custom else True
-    incluir_aca = request.GET.get('productos_academicos') == 'on' if is_custom else True
-    
+    # Se normalizan a booleanos para que sirvan también como parte de la clave de caché.
+    return {
+        seccion: (request.GET.get(seccion) == 'on' if is_custom else True)
+        for seccion in ('experiencia', 'educacion', 'reconocimientos', 'proyectos', 'venta', 'productos_academicos')
+    }
+
+def _nombre_archivo(perfil):
+    name = "".join([c for c in (perfil.nombres if perfil else "CV") if c.isalnum()])
+    return f"CV_{name}.pdf"
+
+def generar_cv(request):
+    # Un solo plazo para toda la petición (turno, adjuntos y render), menor que el timeout de gunicorn
+    with cv_admision.plazo(settings.CV_PLAZO):
+        if not settings.CV_METRICAS:
+            return _generar_cv(request)
+        return _generar_cv_medido(request)
+
+def _generar_cv_medido(request):
+    with cv_metricas.medir() as medicion:
+        with cv_metricas.etapa('total'):
+            response = _generar_cv(request)
+    response['Server-Timing'] = cv_metricas.server_timing(medicion)
+    cv_metricas.registrar(medicion, 'generar_cv', status=response.status_code, query=request.GET.urlencode())
+    return response
+
+def _generar_cv(request):
+    perfil = DatosPersonales.objects.first()
+    styles = get_cv_styles(request)
+    filtros = leer_filtros(request)
+
+    asincrono = request.GET.get('modo') == 'asincrono'
+
+    # La clave de caché (filtros + estilos + versión de datos) sirve también de ETag:
+    # una petición condicional se responde con 304 antes de tocar xhtml2pdf
+    clave = cv_cache.clave_cv(filtros, styles)
+    modificado = cv_cache.fecha_version()
+    if not asincrono:
+        response = get_conditional_response(request, etag=quote_etag(clave), last_modified=modificado)
+        if response is not None:
+            cv_metricas.fijar('cache', 'condicional')
+            return _cabeceras_cache(response, clave, modificado)
+
+    # El CV por defecto es casi todo el tráfico: si nada cambió, se sirve desde disco
+    pdf = cv_cache.abrir(clave)
+    cv_metricas.fijar('cache', 'miss' if pdf is None else 'hit')
+
+    # ?modo=asincrono: no se renderiza en la petición, se devuelve un trabajo para consultar
+    if asincrono:
+        try:
+            trabajo = cv_trabajos.encolar(clave, filtros, styles, pdf)
+        except cv_trabajos.ColaLlena:
+            return _ocupado()
+        finally:
+            if pdf is not None: pdf.close()
+        return JsonResponse(_info_trabajo(request, trabajo), status=200 if trabajo['estado'] == cv_trabajos.LISTO else 202)
+
+    if pdf is None:
+        try:
+            pdf = _render_admitido(perfil, styles, filtros, clave)
+        except cv_admision.Ocupado:
+            return _ocupado()
+
+    incompleto = getattr(pdf, 'incompleto', False)
+    response = respuesta_pdf(request, pdf, _nombre_archivo(perfil), quote_etag(clave), modificado)
+    if incompleto:
+        # Le falta algún certificado: sin validadores, para que ni el navegador ni la CDN lo
+        # guarden y la próxima petición lo vuelva a intentar
+        patch_cache_control(response, no_store=True)
+        return response
+    if response.status_code == 416:
+        # Un error no se publica en CDN ni lleva validadores
+        return response
+    return _cabeceras_cache(response, clave, modificado)
+
+def _render_admitido(perfil, styles, filtros, clave):
+    # Peticiones idénticas esperan al mismo render; las distintas compiten por los cupos.
+    # Todo con un mismo plazo (CV_RENDER_ESPERA): así un pico no ocupa todos los workers.
+    hasta = cv_admision.limite()
+    with cv_admision.en_vuelo(clave, hasta):
+        # Otra petición idéntica pudo terminarlo mientras esperábamos: se comparte su resultado
+        pdf = cv_cache.abrir(clave)
+        if pdf is not None:
+            cv_metricas.fijar('cache', 'compartido')
+            return pdf
+        with cv_admision.cupo(hasta):
+            pdf = construir_cv(perfil, styles, filtros)
+        cv_cache.guardar(clave, pdf)
+        return pdf
+
+def _ocupado():
+    cv_metricas.fijar('cache', 'ocupado')
+    response = HttpResponse("Estamos generando otros CVs en este momento. Intenta de nuevo en unos segundos.",
+                            status=503, content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = settings.CV_RENDER_RETRY_AFTER
+    patch_cache_control(response, no_store=True)
+    return response
+
+def _cabeceras_cache(response, clave, modificado):
+    # Validadores + Cache-Control: navegadores y CDN revalidan y reciben 304 si nada cambió
+    response['ETag'] = quote_etag(clave)
+    response['Last-Modified'] = http_date(modificado)
+    patch_cache_control(response, public=True, max_age=settings.CV_HTTP_MAX_AGE)
+    return response
+
+def _trozos(archivo, restantes, bloque=64 * 1024):
+    try:
+        while restantes > 0:
+            data = archivo.read(min(bloque, restantes))
+            if not data: break
+            restantes -= len(data)
+            yield data
+    finally:
+        archivo.close()
+
+def respuesta_pdf(request, archivo, nombre, etag=None, modificado=None):
+    # Sirve un PDF abierto por bloques (FileResponse), con soporte de un rango "Range: bytes=a-b"
+    # para que los visores puedan pedir trozos. 'etag' y 'modificado' son los validadores contra
+    # los que se evalúa If-Range. Se encarga de cerrar 'archivo'.
+    total = archivo.seek(0, os.SEEK_END)
+    archivo.seek(0)
+
+    cabecera = request.headers.get('Range')
+    if 'If-Range' in request.headers and not _if_range_vigente(request.headers['If-Range'], etag, modificado):
+        # El cliente tiene otra versión: el rango se ignora (ni 206 ni 416)
+        cabecera = None
+    try:
+        rango = _rango(cabecera, total)
+    except RangoInsatisfacible:
+        archivo.close()
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{total}'
+        return response
+
+    if rango:
+        inicio, fin = rango
+        archivo.seek(inicio)
+        response = StreamingHttpResponse(_trozos(archivo, fin - inicio + 1), status=206, content_type='application/pdf')
+        response['Content-Range'] = f'bytes {inicio}-{fin}/{total}'
+        response['Content-Length'] = str(fin - inicio + 1)
+        response['Content-Disposition'] = f'inline; filename="{nombre}"'
+    else:
+        response = FileResponse(archivo, content_type='application/pdf', filename=nombre)
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+def _info_trabajo(request, trabajo):
+    info = {
+        'id': trabajo['id'],
+        'estado': trabajo['estado'],
+        'error': trabajo['error'],
+        'url_estado': request.build_absolute_uri(reverse('estado_cv', args=[trabajo['id']])),
+    }
+    if trabajo['estado'] == cv_trabajos.LISTO:
+        info['url_descarga'] = request.build_absolute_uri(reverse('descargar_cv', args=[trabajo['id']]))
+    return info
+
+def estado_cv(request, trabajo_id):
+    trabajo = cv_trabajos.leer(trabajo_id)
+    if trabajo is None:
+        raise Http404("Trabajo no encontrado o vencido")
+    return JsonResponse(_info_trabajo(request, trabajo))
+
+def descargar_cv(request, trabajo_id):
+    trabajo = cv_trabajos.leer(trabajo_id)
+    if trabajo is None or trabajo['estado'] != cv_trabajos.LISTO:
+        raise Http404("El CV todavía no está listo")
+    try:
+        archivo = open(cv_trabajos.ruta_pdf(trabajo_id), 'rb')
+    except FileNotFoundError:
+        raise Http404("Trabajo vencido")
+    return respuesta_pdf(request, archivo, _nombre_archivo(DatosPersonales.objects.first()))
+
+def construir_cv(perfil, styles, filtros):
+    incluir_exp = filtros['experiencia']
+    incluir_edu = filtros['educacion']
+    incluir_rec = filtros['reconocimientos']
+    incluir_pro = filtros['proyectos']
+    incluir_ven = filtros['venta']
+    incluir_aca = filtros['productos_academicos']
+
     # 2. CONSULTAS A BASE DE DATOS (Condicionadas)
     # Si la variable 'incluir_X' es False, pasamos una lista vacía []
-    
-    experiencias = ExperienciaLaboral.objects.filter(visible=True).order_by('-fecha_inicio') if incluir_exp else []
-    
-    estudios = EstudioRealizado.objects.filter(visible=True).order_by('-fecha_fin') if incluir_edu else []
-    
-    # Nota: Los cursos suelen ir atados a la educación, mantenemos esa lógica
-    cursos_lista = CursoCapacitacion.objects.filter(visible=True).order_by('-fecha_fin') if incluir_edu else []
-    
-    reconocimientos = Reconocimiento.objects.filter(visible=True).order_by('-fecha') if incluir_rec else []
-    
-    proyectos = ProductoLaboral.objects.filter(visible=True).order_by('-fecha') if incluir_pro else []
-    
-    ventas = VentaGarage.objects.filter(activo=True).order_by('-fecha_publicacion') if incluir_ven else []
-    
-    academicos = ProductoAcademico.objects.filter(visible=True) if incluir_aca else []
+    # (se evalúan aquí mismo para que el tiempo de BD quede en su propia etapa)
+    with cv_metricas.etapa('consultas'):
+        experiencias = list(ExperienciaLaboral.objects.filter(visible=True).order_by('-fecha_inicio')) if incluir_exp else []
+
+        estudios = list(EstudioRealizado.objects.filter(visible=True).order_by('-fecha_fin')) if incluir_edu else []
+
+        # Nota: Los cursos suelen ir atados a la educación, mantenemos esa lógica
+        cursos_lista = list(CursoCapacitacion.objects.filter(visible=True).order_by('-fecha_fin')) if incluir_edu else []
+
+        reconocimientos = list(Reconocimiento.objects.filter(visible=True).order_by('-fecha')) if incluir_rec else []
+
+        proyectos = list(ProductoLaboral.objects.filter(visible=True).order_by('-fecha')) if incluir_pro else []
+
+        ventas = list(VentaGarage.objects.filter(activo=True).order_by('-fecha_publicacion')) if incluir_ven else []
+
+        academicos = list(ProductoAcademico.objects.filter(visible=True)) if incluir_aca else []
+
+    # 3. CERTIFICADOS A ANEXAR
+    # Se leen ANTES de renderizar: el índice de anexos tiene que mostrar cuáles no entran en
+    # el presupuesto de bytes/páginas (CV_ADJUNTO_* y CV_ANEXO_* en settings)
+    # Unimos todas las listas que pueden tener PDFs
+    todos_los_items = list(experiencias) + list(cursos_lista) + list(reconocimientos)
+
+    con_archivo = []
+    for item in todos_los_items:
+        # Detectamos el campo dinámicamente:
+        # 1. Intenta buscar 'certificado_pdf' (Cursos/Reconocimientos)
+        # 2. Si no, intenta buscar 'certificado' (Experiencia)
+        archivo = getattr(item, 'certificado_pdf', getattr(item, 'certificado', None))
+        # El índice de anexos muestra esta nota en lugar de "✓ Certificado Adjunto"
+        item.anexo_omitido = item.anexo_paginas = None
+        if archivo: con_archivo.append((item, cv_adjuntos.para_anexo(archivo)))
+    archivos = [archivo for _, archivo in con_archivo]
+
+    # Las lecturas van en paralelo, pero las páginas se agregan en el orden original
+    with cv_metricas.etapa('adjuntos'):
+        anexo = cv_adjuntos.Anexo(archivos)
+    for item, archivo in con_archivo:
+        item.anexo_omitido = anexo.omitidos.get(archivo.name)
 
-    # 3. GENERACIÓN DEL PDF
+    # 4. GENERACIÓN DEL PDF
     pdf_writer = PdfWriter()
     template = get_template('curriculum/cv_pdf.html') 
 
-    def render_part(mode, extra={}):
-        ctx = {'perfil': perfil, 'MEDIA_URL': settings.MEDIA_URL, 'section_mode': mode, 'styles': styles}
-        ctx.update(extra)
-        html = template.render(ctx)
-        buf = BytesIO()
-        pisa.CreatePDF(html, dest=buf, link_callback=link_callback)
-        buf.seek(0)
-        for p in PdfReader(buf).pages: pdf_writer.add_page(p)
+    # Todas las secciones comparten el mismo contexto; lo que cambia es cuáles se incluyen
+    ctx = {
+        'perfil': perfil, 'MEDIA_URL': settings.MEDIA_URL, 'styles': styles,
+        'experiencias': experiencias, 'estudios': estudios, 'cursos': cursos_lista,
+        'reconocimientos': reconocimientos, 'proyectos': proyectos, 'ventas': ventas, 'academicos': academicos,
+        'omitidos': anexo.omitidos, 'rangos': [],
+        # Sin 'motor' en los estilos (benchmark, trabajos encolados antes del cambio) vale el de settings
+        'motor': styles.get('motor', settings.CV_MOTOR_PDF),
+    }
+    modos = []
 
     # PARTE A: Experiencia y Estudios
-    if incluir_exp or incluir_edu:
-        render_part('top', {'experiencias': experiencias, 'estudios': estudios})
-    else:
-        # Si no hay exp ni edu, renderizamos solo cabecera (top) con listas vacías
-        render_part('top', {'experiencias': [], 'estudios': []})
-    
+    # (si no hay exp ni edu, sale solo la cabecera: las listas ya vienen vacías)
+    modos.append('top')
+
     # PARTE B: Cursos
     if cursos_lista: 
-        render_part('courses_list', {'cursos': cursos_lista})
+        modos.append('courses_list')
     
     # PARTE C: Otros Bloques (Ahora respetarán si las listas están vacías)
     if reconocimientos or proyectos or ventas or academicos: 
-        render_part('bottom', {
-            'reconocimientos': reconocimientos, 
-            'proyectos': proyectos, 
-            'ventas': ventas,
-            'academicos': academicos
-        })
+        modos.append('bottom')
         
-    # PARTE D: Índice de Anexos
+    for p in render_secciones(template, ctx, modos): pdf_writer.add_page(p)
 
+    # PARTE D: Índice de Anexos
+    # Va aparte porque indica en qué páginas queda cada certificado, y eso depende de cuántas
+    # ocupa todo lo anterior
     if experiencias or cursos_lista or reconocimientos:
-        render_part('certificates_index', {
-            'cursos': cursos_lista, 
-            'reconocimientos': reconocimientos,
-            'experiencias': experiencias
-        })
-    # PARTE E: Adjuntar PDFs
-    # Unimos todas las listas que pueden tener PDFs
-    todos_los_items = list(experiencias) + list(cursos_lista) + list(reconocimientos)
+        for p in render_indice(template, ctx, anexo, con_archivo, len(pdf_writer.pages)): pdf_writer.add_page(p)
 
-    for item in todos_los_items:
-        # Detectamos el campo dinámicamente:
-        # 1. Intenta buscar 'certificado_pdf' (Cursos/Reconocimientos)
-        # 2. Si no, intenta buscar 'certificado' (Experiencia)
-        archivo = getattr(item, 'certificado_pdf', getattr(item, 'certificado', None))
+    # PARTE E: Adjuntar PDFs
+    with cv_metricas.etapa('adjuntos'):
+        for p in anexo.paginas(): pdf_writer.add_page(p)
+    cv_metricas.anotar('adjuntos', len(archivos))
 
-        if archivo:
-            try:
-                url = archivo.url
-                if not url.startswith('http'): url = request.build_absolute_uri(url)
-                res = requests.get(url, timeout=15)
-                if res.status_code == 200:
-                    for p in PdfReader(BytesIO(res.content)).pages: pdf_writer.add_page(p)
-            except Exception as e:
-                print(f"Error adjuntando PDF: {e}")
-                pass
     # Finalizar
-    try: final_writer = numerar_paginas(pdf_writer)
-    except: final_writer = pdf_writer
-    
-    out = BytesIO()
-    final_writer.write(out)
-    response = HttpResponse(out.getvalue(), content_type='application/pdf')
-    name = "".join([c for c in (perfil.nombres if perfil else "CV") if c.isalnum()])
-    response['Content-Disposition'] = f'inline; filename="CV_{name}.pdf"'
-    return response
\ No newline at end of file
+    with cv_metricas.etapa('numeracion'):
+        try: final_writer = numerar_paginas(pdf_writer)
+        except Exception as e:
+            # numerar_paginas deshace lo que alcanzó a estampar: el CV sale sin números
+            logger.warning("No se pudieron numerar las páginas del CV: %s", e)
+            final_writer = pdf_writer
+    cv_metricas.anotar('paginas', len(final_writer.pages))
+
+    if settings.CV_SALIDA_DETERMINISTA:
+        cv_optimizar.hacer_determinista(final_writer, datetime.datetime.fromtimestamp(cv_cache.fecha_version(), datetime.timezone.utc))
+
+    if settings.CV_OPTIMIZAR_SALIDA:
+        with cv_metricas.etapa('optimizacion'):
+            antes, despues = cv_optimizar.optimizar_salida(final_writer)
+        cv_metricas.anotar('objetos_pdf_antes', antes)
+        cv_metricas.anotar('objetos_pdf', despues)
+
+    # El PDF final va a un temporal que pasa a disco al superar CV_SPOOL_MAX_BYTES:
+    # la memoria del worker ya no crece con el tamaño del documento
+    out = tempfile.SpooledTemporaryFile(max_size=settings.CV_SPOOL_MAX_BYTES)
+    with cv_metricas.etapa('escritura'):
+        final_writer.write(out)
+
+    # "Vista web rápida": con la página 1 al principio, el visor la muestra mientras pide el resto por rangos
+    if settings.CV_LINEALIZAR:
+        lineal = tempfile.SpooledTemporaryFile(max_size=settings.CV_SPOOL_MAX_BYTES)
+        with cv_metricas.etapa('linealizacion'):
+            ok = cv_optimizar.linealizar(out, lineal, determinista=settings.CV_SALIDA_DETERMINISTA)
+        if ok:
+            out.close()
+            out = lineal
+        else:
+            lineal.close()
+        out.seek(0, os.SEEK_END)
+    cv_metricas.anotar('bytes_salida', out.tell())
+    out.seek(0)
+    # Faltan certificados por el plazo: sirve para esta respuesta, no para la caché.
+    # Por error o circuito abierto: se guarda, pero solo hasta el próximo intento
+    out.incompleto = anexo.incompleto
+    out.vence = anexo.vence
+    return out
+
+# Datos del contexto que usa cada sección de cv_pdf.html (para la caché de secciones)
+DEPENDENCIAS_SECCION = {
+    'top': ('perfil', 'experiencias', 'estudios'),
+    'courses_list': ('cursos',),
+    'bottom': ('reconocimientos', 'proyectos', 'ventas', 'academicos'),
+    'certificates_index': ('experiencias', 'cursos', 'reconocimientos', 'omitidos', 'rangos'),
+}
+
+def render_indice(template, ctx, anexo, con_archivo, previas):
+    # El anexo empieza después del índice, pero cuántas páginas ocupa el índice solo se sabe
+    # al renderizarlo: se supone 1 y, si resultan más, se repite con ese número
+    paginas_indice = 1
+    for intento in range(3):
+        rangos = anexo.rangos(previas + paginas_indice + 1)
+        for (item, _), rango in zip(con_archivo, rangos):
+            if rango is None:
+                item.anexo_paginas = None
+            else:
+                item.anexo_paginas = f"pág. {rango[0]}" if rango[0] == rango[1] else f"págs. {rango[0]}–{rango[1]}"
+        paginas = render_secciones(template, {**ctx, 'rangos': rangos}, ['certificates_index'])
+        if len(paginas) == paginas_indice:
+            break
+        paginas_indice = len(paginas)
+    return paginas
+
+def _version_plantilla(template, ctx):
+    # Un cambio en cv_pdf.html (o en cv_platypus, según el motor) tras un deploy no debe reutilizar secciones viejas
+    if ctx['motor'] == 'reportlab':
+        return cv_platypus.version()
+    return hashlib.sha256(template.template.source.encode()).hexdigest()
+
+def _html(template, ctx, modos):
+    with cv_metricas.etapa('plantilla'):
+        return template.render({**ctx, 'secciones': modos})
+
+def _renderizar(template, ctx, grupos):
+    # Un PDF por cada grupo de secciones, con el motor elegido
+    if ctx['motor'] == 'reportlab':
+        with cv_metricas.etapa('platypus'):
+            return [cv_platypus.renderizar(ctx, modos) for modos in grupos]
+    partes = [_html(template, ctx, modos) for modos in grupos]
+    with cv_metricas.etapa('pisa'):
+        # Una sola parte va directo en este proceso (cv_render no usa el pool para menos de 2)
+        return cv_render.renderizar(partes)
+
+def _paginas_pdf(pdfs):
+    return [p for pdf in pdfs for p in PdfReader(BytesIO(pdf)).pages]
+
+def render_secciones(template, ctx, modos):
+    # Devuelve las páginas de las secciones en el orden de 'modos'.
+    # Con caché de secciones: solo se renderizan las secciones cuyos datos cambiaron,
+    # una pasada por sección (en este proceso o en el pool de cv_render).
+    if settings.CV_CACHE_SECCIONES:
+        # 'styles' incluye el motor: cada motor tiene sus propias secciones en caché
+        comunes = {'styles': ctx['styles'], 'MEDIA_URL': ctx['MEDIA_URL'], 'plantilla': _version_plantilla(template, ctx)}
+        claves = {
+            modo: cv_cache.clave_seccion(modo, {**comunes, **{k: ctx[k] for k in DEPENDENCIAS_SECCION[modo]}})
+            for modo in modos
+        }
+        pdfs = {modo: cv_cache.leer_seccion(claves[modo]) for modo in modos}
+        faltan = [modo for modo in modos if pdfs[modo] is None]
+        cv_metricas.anotar('secciones_renderizadas', len(faltan))
+        nuevos = _renderizar(template, ctx, [[modo] for modo in faltan])
+        for modo, pdf in zip(faltan, nuevos):
+            cv_cache.guardar_seccion(claves[modo], pdf)
+            pdfs[modo] = pdf
+        return _paginas_pdf(pdfs[modo] for modo in modos)
+
+    # Sin caché de secciones: un solo documento con saltos de página -> el <style>, las
+    # fuentes y las imágenes se resuelven una vez y hay una sola pasada de xhtml2pdf.
+    if settings.CV_RENDER_UNA_PASADA:
+        try:
+            paginas = _paginas_pdf(_renderizar(template, ctx, [modos]))
+            # Cada sección empieza en página nueva: menos páginas que secciones = algo salió mal
+            if len(paginas) >= len(modos):
+                cv_metricas.anotar('secciones_renderizadas', len(modos))
+                return paginas
+            logger.warning("Render en una pasada incompleto, usando render por secciones")
+        except Exception as e:
+            logger.warning("Error en render de una pasada, usando render por secciones: %s", e)
+
+    # Respaldo: una pasada por sección (con xhtml2pdf, en este proceso o en el pool de cv_render)
+    cv_metricas.anotar('secciones_renderizadas', len(modos))
+    return _paginas_pdf(_renderizar(template, ctx, [[modo] for modo in modos]))
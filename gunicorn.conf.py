@@ -0,0 +1,13 @@
+# gunicorn.conf.py
+# gunicorn lo lee automáticamente desde la carpeta donde se lanza (la raíz del proyecto).
+import os
+
+# Los procesos siguen como antes: lo que diga WEB_CONCURRENCY y, si no está, 1 (el valor por
+# defecto de gunicorn). Más procesos significa más memoria por worker; se suben a propósito,
+# no con este archivo.
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+
+# Lo único nuevo son los hilos: mientras un hilo arma un PDF (limitado por
+# CV_RENDER_MAX_POR_PROCESO), los demás siguen atendiendo las páginas HTML del portafolio.
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
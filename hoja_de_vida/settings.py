@@ -165,6 +165,131 @@ CLOUDINARY_STORAGE = {
 DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 
 
+# === GENERADOR DE CV (PDF) ===
+
+# Carpeta local para las cachés del generador (se puede borrar sin riesgo)
+CV_CACHE_DIR = os.environ.get('CV_CACHE_DIR', os.path.join(BASE_DIR, '.cv_cache'))
+
+# Caché de CVs terminados: límite en bytes y en número de variantes (LRU)
+CV_PDF_CACHE_MAX_BYTES = int(os.environ.get('CV_PDF_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+CV_PDF_CACHE_MAX_ENTRIES = int(os.environ.get('CV_PDF_CACHE_MAX_ENTRIES', 50))
+
+# El CV terminado se arma en memoria hasta este tamaño; por encima pasa a un temporal en disco
+CV_SPOOL_MAX_BYTES = int(os.environ.get('CV_SPOOL_MAX_BYTES', 2 * 1024 * 1024))
+
+# Segundos que navegadores/CDN pueden reutilizar /generar-cv/ sin revalidar (ETag/Last-Modified)
+CV_HTTP_MAX_AGE = int(os.environ.get('CV_HTTP_MAX_AGE', 60))
+
+# Descargas simultáneas de certificados adjuntos por CV
+CV_ADJUNTOS_WORKERS = int(os.environ.get('CV_ADJUNTOS_WORKERS', 6))
+
+# Copia local de los certificados remotos (Cloudinary): límite en bytes (LRU)
+CV_ADJUNTOS_CACHE_MAX_BYTES = int(os.environ.get('CV_ADJUNTOS_CACHE_MAX_BYTES', 300 * 1024 * 1024))
+
+# Presupuesto de certificados anexados: por adjunto y por CV completo. Lo que no entra no se
+# anexa y el índice de anexos lo indica, así la memoria de un render no depende de lo que se suba.
+CV_ADJUNTO_MAX_BYTES = int(os.environ.get('CV_ADJUNTO_MAX_BYTES', 15 * 1024 * 1024))
+CV_ADJUNTO_MAX_PAGINAS = int(os.environ.get('CV_ADJUNTO_MAX_PAGINAS', 30))
+CV_ANEXO_MAX_BYTES = int(os.environ.get('CV_ANEXO_MAX_BYTES', 60 * 1024 * 1024))
+CV_ANEXO_MAX_PAGINAS = int(os.environ.get('CV_ANEXO_MAX_PAGINAS', 150))
+
+# Versión optimizada de los PDF subidos (streams comprimidos, sin objetos duplicados ni recursos
+# sin uso), generada en segundo plano y guardada junto al original. Solo se conserva si ahorra al
+# menos CV_OPTIMIZAR_AHORRO_MINIMO del tamaño (0.1 = 10 %).
+CV_OPTIMIZAR_ADJUNTOS = os.environ.get('CV_OPTIMIZAR_ADJUNTOS', 'True') == 'True'
+CV_OPTIMIZAR_AHORRO_MINIMO = float(os.environ.get('CV_OPTIMIZAR_AHORRO_MINIMO', 0.1))
+
+# Fotos dentro de los certificados: al anexarlas se re-codifican como JPEG (calidad 1-95) si se
+# dibujan a más de CV_IMAGENES_MAX_DPI. Se guardan en la caché de adjuntos. 0 = desactivado.
+CV_IMAGENES_MAX_DPI = int(os.environ.get('CV_IMAGENES_MAX_DPI', 150))
+CV_IMAGENES_CALIDAD = int(os.environ.get('CV_IMAGENES_CALIDAD', 75))
+
+# Pasada final sobre el CV armado: objetos idénticos una sola vez (fuentes e imágenes repetidas
+# en cada sección y en los anexos) y todos los streams de contenido comprimidos
+CV_OPTIMIZAR_SALIDA = os.environ.get('CV_OPTIMIZAR_SALIDA', 'True') == 'True'
+
+# Mismos datos -> mismos bytes: /ID derivado del contenido, fecha de la versión de datos y
+# nombres de imágenes estables (sirve para cachés por hash, ETag y CDN)
+CV_SALIDA_DETERMINISTA = os.environ.get('CV_SALIDA_DETERMINISTA', 'True') == 'True'
+
+# CV linealizado ("vista web rápida", requiere pikepdf): con Range el visor muestra la página 1
+# mientras se descarga el anexo
+CV_LINEALIZAR = os.environ.get('CV_LINEALIZAR', 'True') == 'True'
+
+# Motor de render del CV: 'xhtml2pdf' (plantilla cv_pdf.html) o 'reportlab' (el mismo diseño
+# armado con flowables de ReportLab, sin parsear HTML/CSS). Cada petición puede elegir con ?motor=
+CV_MOTOR_PDF = os.environ.get('CV_MOTOR_PDF', 'xhtml2pdf')
+
+# Caché por sección: tras editar un curso solo se vuelven a renderizar las secciones que lo
+# usan. Con la caché activa, las secciones que faltan se renderizan una por pasada.
+CV_CACHE_SECCIONES = os.environ.get('CV_CACHE_SECCIONES', 'True') == 'True'
+CV_SECCIONES_CACHE_MAX_BYTES = int(os.environ.get('CV_SECCIONES_CACHE_MAX_BYTES', 50 * 1024 * 1024))
+
+# Sin caché por sección: render del CV en un solo documento (una pasada de xhtml2pdf).
+# Con False, o si falla, se renderiza una sección por pasada como antes.
+CV_RENDER_UNA_PASADA = os.environ.get('CV_RENDER_UNA_PASADA', 'True') == 'True'
+
+# Render por secciones en un pool de procesos (0 = desactivado, todo en el proceso de la petición).
+# Cada worker se recicla tras N renders para contener la memoria de xhtml2pdf.
+CV_RENDER_PROCESOS = int(os.environ.get('CV_RENDER_PROCESOS', 0))
+CV_RENDER_TAREAS_POR_PROCESO = int(os.environ.get('CV_RENDER_TAREAS_POR_PROCESO', 20))
+
+# Control de admisión: renders simultáneos por worker y en toda la instancia (el resto de hilos
+# sigue atendiendo el portafolio HTML). Quien no consigue turno en CV_RENDER_ESPERA segundos
+# recibe 503 con Retry-After. Peticiones idénticas esperan al mismo render.
+# Los trabajos en segundo plano (?modo=asincrono) dejan libre un cupo para las peticiones
+# síncronas solo si ambos límites son 2 o más; con los valores por defecto (1 por proceso) un
+# trabajo que renderiza hace esperar, y quizá recibir 503, a las síncronas de ese worker.
+CV_RENDER_MAX_POR_PROCESO = int(os.environ.get('CV_RENDER_MAX_POR_PROCESO', 1))
+CV_RENDER_MAX_GLOBAL = int(os.environ.get('CV_RENDER_MAX_GLOBAL', 2))
+CV_RENDER_ESPERA = float(os.environ.get('CV_RENDER_ESPERA', 15))
+CV_RENDER_RETRY_AFTER = int(os.environ.get('CV_RENDER_RETRY_AFTER', 10))
+
+# Plazo total de /generar-cv/ en segundos (por debajo del timeout de gunicorn, 30 s). Los
+# certificados que no llegan antes de CV_PLAZO - CV_PLAZO_RESERVA se cancelan y el CV sale sin
+# ellos (marcados en el índice de anexos); la reserva queda para renderizar y escribir el PDF.
+CV_PLAZO = float(os.environ.get('CV_PLAZO', 25))
+CV_PLAZO_RESERVA = float(os.environ.get('CV_PLAZO_RESERVA', 8))
+
+# Circuito de certificados: tras CV_CIRCUITO_UMBRAL fallos seguidos, un certificado se salta
+# durante CV_CIRCUITO_ESPERA segundos (se duplica en cada nuevo fallo, hasta CV_CIRCUITO_ESPERA_MAX).
+# El estado se ve en el admin ("Fallos de certificados"). Un CV al que le falta un certificado
+# que falló queda en la caché hasta que se abre su circuito o, si no, CV_CIRCUITO_ESPERA segundos.
+CV_CIRCUITO_UMBRAL = int(os.environ.get('CV_CIRCUITO_UMBRAL', 3))
+CV_CIRCUITO_ESPERA = int(os.environ.get('CV_CIRCUITO_ESPERA', 300))
+CV_CIRCUITO_ESPERA_MAX = int(os.environ.get('CV_CIRCUITO_ESPERA_MAX', 6 * 3600))
+
+# Trabajos en segundo plano (?modo=asincrono): vida de un resultado terminado y tiempo
+# máximo sin avances antes de dar por muerto un trabajo pendiente (segundos)
+CV_TRABAJOS_TTL = int(os.environ.get('CV_TRABAJOS_TTL', 3600))
+CV_TRABAJOS_TIMEOUT = int(os.environ.get('CV_TRABAJOS_TIMEOUT', 600))
+# Trabajos esperando en la cola de cada worker; con la cola llena se responde 503. Los trabajos
+# usan como mucho CV_RENDER_MAX_POR_PROCESO - 1 y CV_RENDER_MAX_GLOBAL - 1 cupos de render (ver arriba).
+CV_TRABAJOS_MAX_COLA = int(os.environ.get('CV_TRABAJOS_MAX_COLA', 10))
+
+# Variantes extra (query strings de /generar-cv/) que 'manage.py calentar_cv' deja en caché
+# además del CV por defecto. Ej: CV_VARIANTES_CALENTAR="origen=personalizado&experiencia=on;..."
+CV_VARIANTES_CALENTAR = [v for v in os.environ.get('CV_VARIANTES_CALENTAR', '').split(';') if v]
+
+# Tiempos por etapa de /generar-cv/ (cabecera Server-Timing + un registro JSON por CV en el
+# logger 'curriculum'). Solo mide con perf_counter/process_time: se puede dejar activo.
+CV_METRICAS = os.environ.get('CV_METRICAS', 'True') == 'True'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'curriculum': {
+            'handlers': ['console'],
+            'level': os.environ.get('CV_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
+
+
 
 # Añade esto al final de settings.py para definir el tipo de ID por defecto
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file